@@ -4,6 +4,7 @@
 環境変数の読み込みと設定の一元管理を行います。
 """
 
+import logging
 import os
 from pathlib import Path
 from typing import Any, Dict, Optional, TypeVar, Union, cast
@@ -55,6 +56,12 @@ class Config:
             "factory": os.environ.get("factory", "AAA"),
             "machine_id": os.environ.get("machine_id", "No.1"),
             "data_label": os.environ.get("data_label", "２０２４年点検"),
+            # DuckDBのメモリ上限（例: "4GB"。空の場合はDuckDBの既定値）
+            "db_memory_limit": os.environ.get("db_memory_limit", ""),
+            # DuckDBのチェックポイントを行うWALサイズ（例: "1GB"。空の場合はDuckDBの既定値）
+            "db_checkpoint_threshold": os.environ.get("db_checkpoint_threshold", ""),
+            # DuckDBの一時ファイルの出力先（空の場合はDuckDBの既定値）
+            "db_temp_directory": os.environ.get("db_temp_directory", ""),
         }
 
         logger.debug(f"設定を初期化しました: {self._settings}")
@@ -71,7 +78,9 @@ class Config:
             Union[Any, T]: 設定値
         """
         value = self._settings.get(key, default)
-        logger.debug(f"設定値を取得: {key} = {value}")
+        # DEBUGが無効な場合はログメッセージの組み立て自体を行わない
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"設定値を取得: {key} = {value}")
         return value
 
     def set(self, key: str, value: Any) -> None:
@@ -82,7 +91,8 @@ class Config:
             key (str): 設定キー
             value (Any): 設定値
         """
-        logger.debug(f"設定値を更新: {key} = {value}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"設定値を更新: {key} = {value}")
         self._settings[key] = value
 
     def get_all(self) -> Dict[str, Any]:
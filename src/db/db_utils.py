@@ -6,12 +6,14 @@ DuckDBデータベースの初期化、処理済みファイル管理などの
 
 import datetime
 import enum
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, cast
 
 import duckdb
 import polars as pl
 
+from src.config.config import config
 from src.utils.error_handlers import DatabaseOperationError, safe_operation
 from src.utils.logging_config import get_logger
 
@@ -19,6 +21,10 @@ from src.utils.logging_config import get_logger
 logger = get_logger("db_utils")
 
 
+# 挿入前に文字列から除去する制御文字のパターン
+INVALID_CHARS_PATTERN = r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]"
+
+
 class ProcessStatus(enum.Enum):
     """ファイル処理状態を表す列挙型"""
 
@@ -85,6 +91,9 @@ class DatabaseManager:
                 "データベース接続が確立できませんでした", operation="connect"
             )
 
+        # 一括取り込み向けの設定
+        self._configure_connection()
+
         # 処理状態を管理するための列を追加したprocessed_filesテーブルを作成
         self.conn.execute(
             """
@@ -100,44 +109,49 @@ class DatabaseManager:
         """
         )
 
-        # file_hashのインデックスを削除して再作成（トランザクションで囲む）
-        try:
-            self.conn.execute("BEGIN TRANSACTION")
+        # file_hashのインデックスを作成（既に存在する場合は何もしない）
+        # 以前のUNIQUEインデックスが残っている場合のみ、削除して普通のインデックスとして再作成する
+        # （起動のたびに再作成するとテーブル全体の走査になるため）
+        if not self.read_only:
+            try:
+                self.conn.execute("BEGIN TRANSACTION")
 
-            # インデックスが存在するか確認して削除
-            result = self.conn.execute(
+                result = self.conn.execute(
+                    """
+                    SELECT COUNT(*)
+                    FROM duckdb_indexes()
+                    WHERE table_name = 'processed_files'
+                        AND index_name = 'idx_processed_files_hash'
+                        AND is_unique
                 """
-                SELECT COUNT(*) 
-                FROM duckdb_indexes() 
-                WHERE table_name = 'processed_files' AND index_name = 'idx_processed_files_hash'
-            """
-            ).fetchone()
+                ).fetchone()
 
-            if result[0] > 0:
-                self.conn.execute("DROP INDEX idx_processed_files_hash")
-                logger.debug(
-                    "既存のインデックス idx_processed_files_hash を削除しました"
-                )
+                if result[0] > 0:
+                    self.conn.execute("DROP INDEX idx_processed_files_hash")
+                    logger.debug(
+                        "UNIQUEインデックス idx_processed_files_hash を削除しました"
+                    )
 
-            # インデックスを再作成（UNIQUEではなく普通のインデックスとして）
-            self.conn.execute(
+                # インデックスを作成（UNIQUEではなく普通のインデックスとして）
+                self.conn.execute(
+                    """
+                    CREATE INDEX IF NOT EXISTS idx_processed_files_hash
+                    ON processed_files(file_hash)
                 """
-                CREATE INDEX IF NOT EXISTS idx_processed_files_hash 
-                ON processed_files(file_hash)
-            """
-            )
-            self.conn.execute("COMMIT")
-            logger.debug("インデックス idx_processed_files_hash を作成しました")
-        except Exception as e:
-            self.conn.execute("ROLLBACK")
-            logger.warning(f"インデックス再作成中にエラー: {str(e)}")
+                )
+                self.conn.execute("COMMIT")
+                logger.debug("インデックス idx_processed_files_hash を確認しました")
+            except Exception as e:
+                self.conn.execute("ROLLBACK")
+                logger.warning(f"インデックス作成中にエラー: {str(e)}")
 
         # センサーデータ格納テーブル
         self.conn.execute(
             """
             CREATE TABLE IF NOT EXISTS sensor_data (
                 Time TIMESTAMP,
-                value VARCHAR,
+                value DOUBLE,
+                value_text VARCHAR,
                 sensor_id VARCHAR,
                 sensor_name VARCHAR,
                 unit VARCHAR,
@@ -149,10 +163,115 @@ class DatabaseManager:
             )
         """
         )
+
+        # value列が文字列型の既存データベースを移行する
+        if not self.read_only:
+            self._migrate_sensor_data_value()
+
+        # 実際のテーブルの列順（列を追加した既存テーブルではDDLの定義順と異なる）
+        # Arrowからの挿入は列の位置で対応付けるため、挿入前にこの順に並べ替える
+        self.sensor_data_columns: List[str] = [
+            row[1]
+            for row in self.conn.execute("PRAGMA table_info('sensor_data')").fetchall()
+        ]
+
+        # ファイルハッシュのキャッシュテーブル
+        # パス・サイズ・更新時刻が前回と同じファイルはハッシュを再計算しない
+        # （ZIP内のファイルはpathを「ZIPパス!ZIP内パス」、mtime_nsをCRC32として記録する）
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_hash_cache (
+                path VARCHAR PRIMARY KEY,
+                size BIGINT NOT NULL,
+                mtime_ns BIGINT NOT NULL,
+                file_hash VARCHAR NOT NULL
+            )
+        """
+        )
         logger.debug("テーブル構造を確認しました")
 
         return cast(duckdb.DuckDBPyConnection, self.conn)
 
+    def _migrate_sensor_data_value(self) -> None:
+        """
+        sensor_dataのvalue列を文字列型から数値型（DOUBLE）に移行する
+
+        以前のバージョンではvalue列がVARCHARで、値を文字列のまま格納していた。
+        既存の行も新しい行と同じ形式になるよう、数値に変換できる値はvalue列に、
+        変換できない空でない値はvalue_text列に移す（"1"は1.0となる）。
+        """
+        conn = cast(duckdb.DuckDBPyConnection, self.conn)
+        result = conn.execute(
+            """
+            SELECT data_type
+            FROM duckdb_columns()
+            WHERE table_name = 'sensor_data' AND column_name = 'value'
+        """
+        ).fetchone()
+        if result is None or result[0] != "VARCHAR":
+            # 新しいテーブル、または移行済み
+            conn.execute(
+                "ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS value_text VARCHAR"
+            )
+            return
+
+        logger.info("sensor_dataのvalue列を数値型に移行します")
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute(
+                "ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS value_text VARCHAR"
+            )
+            # 数値に変換できない値を先にvalue_text列へ退避する
+            conn.execute(
+                """
+                UPDATE sensor_data
+                SET value_text = value
+                WHERE TRY_CAST(trim(value) AS DOUBLE) IS NULL AND trim(value) <> ''
+            """
+            )
+            conn.execute(
+                """
+                ALTER TABLE sensor_data
+                ALTER value TYPE DOUBLE USING TRY_CAST(trim(value) AS DOUBLE)
+            """
+            )
+            conn.execute("COMMIT")
+            logger.info("sensor_dataのvalue列を数値型に移行しました")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"value列の移行中にエラー: {str(e)}")
+            raise DatabaseOperationError(
+                "sensor_dataのvalue列の移行に失敗しました",
+                operation="migrate_sensor_data_value",
+            ) from e
+
+    def _configure_connection(self) -> None:
+        """一括取り込み向けにDuckDBの実行設定を行う"""
+        if self.conn is None:
+            return
+
+        settings = [
+            # 挿入順序の保持は不要（クエリ側で並び替える）。保持しない方が並列に書き込める
+            "SET preserve_insertion_order = false",
+            f"SET threads = {os.cpu_count() or 1}",
+        ]
+        # 以下は設定されている場合のみ変更する（空の場合はDuckDBの既定値）
+        optional_settings = {
+            "memory_limit": config.get("db_memory_limit"),
+            # WALが大きくなるまでチェックポイントを遅らせ、取り込み中の書き出しを減らす
+            "checkpoint_threshold": config.get("db_checkpoint_threshold"),
+            "temp_directory": config.get("db_temp_directory"),
+        }
+        for name, value in optional_settings.items():
+            if value:
+                settings.append(f"SET {name} = '{value}'")
+
+        for setting in settings:
+            try:
+                self.conn.execute(setting)
+            except Exception as e:
+                logger.warning(f"DuckDBの設定に失敗しました: {setting} - {str(e)}")
+
     def close(self) -> None:
         """データベース接続を閉じる"""
         if self.conn:
@@ -183,16 +302,18 @@ class DatabaseManager:
         source_zip_value = "" if source_zip is None else str(source_zip)
 
         try:
+            # 件数は不要なため、最初に一致した行で打ち切る
             result = self.conn.execute(
                 """
-                SELECT COUNT(*) 
-                FROM processed_files 
+                SELECT 1
+                FROM processed_files
                 WHERE file_path = ? AND source_zip = ? AND status = ?
+                LIMIT 1
                 """,
                 [file_name, source_zip_value, ProcessStatus.COMPLETED.value],
             ).fetchone()
 
-            is_processed = result[0] > 0
+            is_processed = result is not None
             logger.debug(
                 f"ファイルパスによる処理済みチェック: {file_name} "
                 f"(source_zip: {source_zip_value}) -> {is_processed}"
@@ -218,16 +339,18 @@ class DatabaseManager:
             return False
 
         try:
+            # 件数は不要なため、最初に一致した行で打ち切る
             result = self.conn.execute(
                 """
-                SELECT COUNT(*) 
-                FROM processed_files 
+                SELECT 1
+                FROM processed_files
                 WHERE file_hash = ? AND status = ?
+                LIMIT 1
                 """,
                 [file_hash, ProcessStatus.COMPLETED.value],
             ).fetchone()
 
-            is_processed = result[0] > 0
+            is_processed = result is not None
             logger.debug(
                 f"ファイルハッシュによる処理済みチェック: {file_hash} -> {is_processed}"
             )
@@ -236,6 +359,99 @@ class DatabaseManager:
             logger.error(f"ファイルハッシュチェック中にエラー: {str(e)}")
             return False
 
+    def get_processed_file_keys(self) -> Tuple[Set[Tuple[str, str]], Set[str]]:
+        """
+        処理済み（COMPLETED）ファイルのパスとハッシュをまとめて取得する
+        ファイルごとに問い合わせる代わりに、前処理の開始時に一度だけ読み込むために使用します
+
+        Returns:
+            tuple: ((ファイル名, ZIPファイルパス) の集合, ファイルハッシュの集合)
+        """
+        if self.conn is None:
+            logger.error("データベース接続が確立されていません")
+            return set(), set()
+
+        try:
+            rows = self.conn.execute(
+                """
+                SELECT file_path, source_zip, file_hash
+                FROM processed_files
+                WHERE status = ?
+                """,
+                [ProcessStatus.COMPLETED.value],
+            ).fetchall()
+
+            processed_paths = {
+                (file_path, source_zip) for file_path, source_zip, _ in rows
+            }
+            processed_hashes = {file_hash for _, _, file_hash in rows}
+            logger.debug(f"処理済みファイルを読み込みました: {len(rows)}件")
+            return processed_paths, processed_hashes
+        except Exception as e:
+            logger.error(f"処理済みファイルの読み込み中にエラー: {str(e)}")
+            return set(), set()
+
+    def get_file_hash_cache(self) -> Dict[str, Tuple[int, int, str]]:
+        """
+        ファイルハッシュのキャッシュをまとめて取得する
+        ファイルごとに問い合わせる代わりに、前処理の開始時に一度だけ読み込むために使用します
+
+        Returns:
+            dict: キャッシュのキーとなるパス -> (ファイルサイズ, 更新時刻（ZIP内のファイルはCRC32）, ハッシュ値)
+        """
+        if self.conn is None:
+            logger.error("データベース接続が確立されていません")
+            return {}
+
+        try:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns, file_hash FROM file_hash_cache"
+            ).fetchall()
+            logger.debug(f"ハッシュキャッシュを読み込みました: {len(rows)}件")
+            return {
+                path: (size, mtime_ns, file_hash)
+                for path, size, mtime_ns, file_hash in rows
+            }
+        except Exception as e:
+            logger.error(f"ハッシュキャッシュの読み込み中にエラー: {str(e)}")
+            return {}
+
+    def cache_file_hashes(self, records: List[Tuple[str, int, int, str]]) -> bool:
+        """
+        複数のファイルハッシュをまとめてキャッシュに登録する（既存の場合は更新）
+
+        Parameters:
+            records (list): (パス, サイズ, 更新時刻, ファイルハッシュ) のリスト
+
+        Returns:
+            bool: 成功した場合はTrue
+        """
+        if self.conn is None:
+            logger.error("データベース接続が確立されていません")
+            return False
+
+        # 読み取り専用モードの場合は何もせずにTrueを返す
+        if self.read_only or not records:
+            return True
+
+        try:
+            self.conn.executemany(
+                """
+                INSERT INTO file_hash_cache (path, size, mtime_ns, file_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    file_hash = excluded.file_hash
+                """,
+                [list(record) for record in records],
+            )
+            logger.debug(f"{len(records)}件のハッシュをキャッシュに登録しました")
+            return True
+        except Exception as e:
+            logger.error(f"ハッシュキャッシュの登録中にエラー: {str(e)}")
+            return False
+
     def update_file_status(
         self,
         file_path: Union[str, Path],
@@ -266,51 +482,17 @@ class DatabaseManager:
             )
             return True
 
-        now = datetime.datetime.now()
         source_zip_value = "" if source_zip is None else str(source_zip)
         # ファイルパスからファイル名を抽出
         file_name = Path(file_path).name
 
         try:
-            # 既存のレコードを確認
-            result = self.conn.execute(
-                """
-                SELECT COUNT(*) 
-                FROM processed_files 
-                WHERE file_path = ? AND source_zip = ?
-                """,
-                [file_name, source_zip_value],
-            ).fetchone()
-
-            if result[0] > 0:
-                # 既存のレコードが存在する場合は更新
-                self.conn.execute(
-                    """
-                    UPDATE processed_files 
-                    SET file_hash = ?, processed_date = ?, status = ?, status_updated_at = ?
-                    WHERE file_path = ? AND source_zip = ?
-                    """,
-                    [file_hash, now, status.value, now, file_name, source_zip_value],
-                )
-                logger.debug(
-                    f"ファイル状態を更新しました: {file_name} "
-                    f"(source_zip: {source_zip_value}) -> {status.value}"
-                )
-            else:
-                # 新規レコードの場合は挿入
-                self.conn.execute(
-                    """
-                    INSERT INTO processed_files 
-                    (file_path, file_hash, source_zip, processed_date, status, status_updated_at) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    [file_name, file_hash, source_zip_value, now, status.value, now],
-                )
-                logger.debug(
-                    f"ファイル状態を新規登録しました: {file_name} "
-                    f"(source_zip: {source_zip_value}) -> {status.value}"
-                )
-
+            # 既存のレコードの有無を確認せず、1文で登録する（既存の場合は更新）
+            self._upsert_file_statuses([(file_path, file_hash, source_zip)], status)
+            logger.debug(
+                f"ファイル状態を更新しました: {file_name} "
+                f"(source_zip: {source_zip_value}) -> {status.value}"
+            )
             return True
         except Exception as e:
             logger.error(f"状態更新中にエラー ({file_name}): {str(e)}")
@@ -423,6 +605,68 @@ class DatabaseManager:
         )
         return self.mark_file_as_completed(file_path, file_hash, source_zip)
 
+    def _upsert_file_statuses(
+        self,
+        records: List[Tuple[Union[str, Path], str, Optional[Union[str, Path]]]],
+        status: ProcessStatus,
+    ) -> None:
+        """
+        複数ファイルの処理状態を登録する（既存レコードは更新。トランザクションは呼び出し元で管理する）
+
+        Parameters:
+            records (list): (ファイルパス, ファイルハッシュ, ZIPファイルパス) のリスト
+            status (ProcessStatus): 処理状態
+        """
+        if not records:
+            return
+
+        now = datetime.datetime.now()
+        # ファイル名はレコードごとにPathを作らず、os.path.basenameで取り出す
+        # 1文で登録する場合、同じキーの行が複数あるとON CONFLICTで失敗するため、
+        # 後のレコードを優先して重複を除く（1件ずつ登録した場合と同じ結果になる）
+        rows: Dict[Tuple[str, str], str] = {}
+        for file_path, file_hash, source_zip in records:
+            key = (
+                os.path.basename(file_path),
+                "" if source_zip is None else str(source_zip),
+            )
+            rows.pop(key, None)
+            rows[key] = file_hash
+
+        status_df = pl.DataFrame(
+            {
+                "file_path": [file_name for file_name, _ in rows],
+                "file_hash": list(rows.values()),
+                "source_zip": [source_zip for _, source_zip in rows],
+            },
+            schema={
+                "file_path": pl.Utf8,
+                "file_hash": pl.Utf8,
+                "source_zip": pl.Utf8,
+            },
+        )
+
+        # 行ごとに実行せず、Arrowテーブルからの1文で登録する
+        conn = cast(duckdb.DuckDBPyConnection, self.conn)
+        conn.register("temp_file_status", status_df.to_arrow())
+        try:
+            conn.execute(
+                """
+                INSERT INTO processed_files
+                (file_path, file_hash, source_zip, processed_date, status, status_updated_at)
+                SELECT file_path, file_hash, source_zip, ?, ?, ?
+                FROM temp_file_status
+                ON CONFLICT (file_path, source_zip) DO UPDATE SET
+                    file_hash = excluded.file_hash,
+                    processed_date = excluded.processed_date,
+                    status = excluded.status,
+                    status_updated_at = excluded.status_updated_at
+                """,
+                [now, status.value, now],
+            )
+        finally:
+            conn.unregister("temp_file_status")
+
     def unmark_file_as_processed(
         self, file_path: Union[str, Path], source_zip: Optional[Union[str, Path]] = None
     ) -> bool:
@@ -498,14 +742,17 @@ class DatabaseManager:
             ).fetchone()
 
             if result and result[0]:
-                # 文字列から列挙型に変換
-                for status in ProcessStatus:
-                    if status.value == result[0]:
-                        logger.debug(
-                            f"ファイル状態を取得: {file_name} "
-                            f"(source_zip: {source_zip_value}) -> {status.value}"
-                        )
-                        return status
+                # 文字列から列挙型に変換（値による検索のため全メンバーを走査しない）
+                try:
+                    status = ProcessStatus(result[0])
+                    logger.debug(
+                        f"ファイル状態を取得: {file_name} "
+                        f"(source_zip: {source_zip_value}) -> {status.value}"
+                    )
+                    return status
+                except ValueError:
+                    # 未知の状態値は見つからない場合と同様に扱う
+                    pass
 
             logger.debug(
                 f"ファイル状態が見つかりません: {file_name} (source_zip: {source_zip_value})"
@@ -515,6 +762,121 @@ class DatabaseManager:
             logger.error(f"ファイル状態取得中にエラー ({file_name}): {str(e)}")
             return None
 
+    def _prepare_arrow_table(self, data_df: pl.DataFrame) -> Any:
+        """
+        センサーデータの文字列を挿入用にクリーニングし、Arrowテーブルに変換する
+
+        Parameters:
+            data_df (pl.DataFrame): Polars DataFrame
+
+        Returns:
+            pyarrow.Table or None: 挿入するArrowテーブル、有効な行がない場合はNone
+        """
+        # エンコーディング問題を回避するため、文字列データを事前にクリーニング
+        logger.debug("データフレームの文字列カラムをクリーニング")
+        string_columns = [
+            col
+            for col in data_df.columns
+            if data_df[col].dtype == pl.Utf8 or data_df[col].dtype == pl.String
+        ]
+
+        # カテゴリ型カラムは辞書（カテゴリ一覧）に無効な文字を含む場合のみ対象とする
+        # （通常は辞書の検査だけで済み、行ごとの文字列処理は発生しない）
+        categorical_columns = [
+            col
+            for col in data_df.columns
+            if data_df[col].dtype == pl.Categorical
+            and data_df[col]
+            .cat.get_categories()
+            .str.contains(INVALID_CHARS_PATTERN)
+            .any()
+        ]
+
+        # 文字列カラムの無効な文字を置換
+        if string_columns or categorical_columns:
+            clean_df = data_df.with_columns(
+                [
+                    pl.col(col).str.replace_all(INVALID_CHARS_PATTERN, "")
+                    for col in string_columns
+                ]
+                + [
+                    pl.col(col)
+                    .cast(pl.Utf8)
+                    .str.replace_all(INVALID_CHARS_PATTERN, "")
+                    .cast(pl.Categorical)
+                    for col in categorical_columns
+                ]
+            )
+        else:
+            clean_df = data_df
+
+        # DataFrameをArrowテーブルに変換
+        try:
+            logger.debug("DataFrameをArrowテーブルに変換")
+            return clean_df.to_arrow()
+        except Exception as arrow_err:
+            logger.error(f"Arrowテーブル変換中にエラー: {str(arrow_err)}")
+            # フォールバック: 問題のある行を特定して除外
+            # 1行ずつ試さず、変換できない範囲を二分して絞り込む
+            logger.warning("問題のある行を特定して除外します")
+            valid_parts = self._convertible_slices(clean_df)
+
+            if not valid_parts:
+                logger.error("有効な行がありません")
+                return None
+
+            # 有効な行だけのデータフレームを作成
+            clean_df = pl.concat(valid_parts, how="vertical")
+            logger.info(f"クリーニング後の行数: {len(clean_df)}")
+            return clean_df.to_arrow()
+
+    @classmethod
+    def _convertible_slices(
+        cls, data_df: pl.DataFrame, offset: int = 0
+    ) -> List[pl.DataFrame]:
+        """
+        Arrowテーブルに変換できる部分だけを取り出す
+
+        変換に失敗した範囲を半分に分けて再帰的に試すため、問題のある行が少なければ
+        変換の試行回数は行数の対数程度で済む。
+
+        Parameters:
+            data_df (pl.DataFrame): 対象のデータフレーム
+            offset (int): 元のデータフレームにおける先頭行の位置（ログ出力用）
+
+        Returns:
+            List[pl.DataFrame]: 変換できる部分のリスト（元の行順）
+        """
+        try:
+            data_df.to_arrow()
+            return [data_df]
+        except Exception:
+            if len(data_df) <= 1:
+                logger.warning(f"行 {offset} は変換できないためスキップします")
+                return []
+
+        mid = len(data_df) // 2
+        return cls._convertible_slices(
+            data_df.slice(0, mid), offset
+        ) + cls._convertible_slices(data_df.slice(mid), offset + mid)
+
+    def _insert_arrow_table(self, arrow_table: Any) -> int:
+        """
+        Arrowテーブルをsensor_dataテーブルに挿入する
+
+        Parameters:
+            arrow_table (pyarrow.Table): 挿入するArrowテーブル
+
+        Returns:
+            int: 挿入された行数
+        """
+        # ビューの登録やINSERT文を介さず、Arrowテーブルをそのまま追加する
+        # （列はテーブルの列順に並べ替えてから渡す）
+        cast(duckdb.DuckDBPyConnection, self.conn).from_arrow(
+            arrow_table.select(self.sensor_data_columns)
+        ).insert_into("sensor_data")
+        return arrow_table.num_rows
+
     def insert_sensor_data(self, data_df: pl.DataFrame) -> int:
         """
         センサーデータをデータベースに挿入する
@@ -542,86 +904,21 @@ class DatabaseManager:
             return 0
 
         try:
-            # エンコーディング問題を回避するため、文字列データを事前にクリーニング
-            logger.debug("データフレームの文字列カラムをクリーニング")
-            string_columns = [
-                col
-                for col in data_df.columns
-                if data_df[col].dtype == pl.Utf8 or data_df[col].dtype == pl.String
-            ]
-
-            # 文字列カラムの無効な文字を置換
-            if string_columns:
-                clean_df = data_df.with_columns(
-                    [
-                        pl.col(col).str.replace_all(
-                            r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]", ""
-                        )
-                        for col in string_columns
-                    ]
-                )
-            else:
-                clean_df = data_df
+            arrow_table = self._prepare_arrow_table(data_df)
+            if arrow_table is None:
+                return 0
 
-            # DataFrameをArrowテーブルに変換
+            # 1文の挿入のため、明示的なトランザクションは不要（失敗時は自動で取り消される）
             try:
-                logger.debug("DataFrameをArrowテーブルに変換")
-                arrow_table = clean_df.to_arrow()
-            except Exception as arrow_err:
-                logger.error(f"Arrowテーブル変換中にエラー: {str(arrow_err)}")
-                # フォールバック: 問題のある行を特定して除外
-                logger.warning("問題のある行を特定して除外します")
-                valid_rows = []
-                for i in range(len(clean_df)):
-                    try:
-                        # 1行ずつArrowに変換を試みる
-                        row_df = clean_df.slice(i, 1)
-                        row_df.to_arrow()
-                        valid_rows.append(i)
-                    except Exception:
-                        logger.warning(f"行 {i} は変換できないためスキップします")
-
-                if not valid_rows:
-                    logger.error("有効な行がありません")
-                    return 0
-
-                # 有効な行だけのデータフレームを作成
-                clean_df = clean_df.select(valid_rows)
-                arrow_table = clean_df.to_arrow()
-                logger.info(f"クリーニング後の行数: {len(clean_df)}")
-
-            # 一時テーブルとして登録
-            self.conn.register("temp_sensor_data", arrow_table)
-
-            # トランザクションを開始
-            self.conn.execute("BEGIN TRANSACTION")
-
-            try:
-                # SQLで一括挿入（Arrow形式からの直接挿入）
-                self.conn.execute(
-                    """
-                    INSERT INTO sensor_data 
-                    SELECT * FROM temp_sensor_data
-                """
-                )
-
-                # 一時テーブルを削除
-                self.conn.execute("DROP VIEW IF EXISTS temp_sensor_data")
-
-                # コミット
-                self.conn.execute("COMMIT")
-
-                # 挿入された行数を取得
-                row_count = len(clean_df)
+                row_count = self._insert_arrow_table(arrow_table)
                 logger.info(f"センサーデータを {row_count} 行挿入しました")
 
                 return row_count
             except Exception as e:
-                # エラーが発生した場合はロールバック
-                self.conn.execute("ROLLBACK")
                 logger.error(f"センサーデータ挿入中にエラー: {str(e)}")
                 raise DatabaseOperationError(
-                    "センサーデータの挿入に失敗しました", operation="insert_sensor_data"
+                    "センサーデータの挿入に失敗しました",
+                    operation="insert_sensor_data",
                 ) from e
         except Exception as e:
             logger.error(f"データ準備中にエラー: {str(e)}")
@@ -629,6 +926,69 @@ class DatabaseManager:
                 "センサーデータの準備に失敗しました", operation="insert_sensor_data"
             ) from e
 
+    def insert_sensor_data_batch(
+        self,
+        data_frames: List[pl.DataFrame],
+        completed_records: List[
+            Tuple[Union[str, Path], str, Optional[Union[str, Path]]]
+        ],
+    ) -> int:
+        """
+        複数ファイルのセンサーデータと処理済みの記録を1つのトランザクションで登録する
+        ファイルごとにコミットする場合に比べ、コミット（WALのフラッシュ）の回数を減らせます
+
+        Parameters:
+            data_frames (list): 挿入するPolars DataFrameのリスト
+            completed_records (list): 正常終了としてマークする
+                (ファイルパス, ファイルハッシュ, ZIPファイルパス) のリスト
+
+        Returns:
+            int: 挿入された行数
+
+        Raises:
+            DatabaseOperationError: 登録に失敗した場合（トランザクションはロールバックされる）
+        """
+        if self.conn is None:
+            logger.error("データベース接続が確立されていません")
+            return 0
+
+        # 読み取り専用モードの場合は何もせずに行数を返す
+        if self.read_only:
+            logger.info(
+                "読み取り専用モードのため、センサーデータの挿入はスキップします"
+            )
+            return sum(len(df) for df in data_frames)
+
+        try:
+            # トランザクション外で挿入用のArrowテーブルを準備する
+            arrow_tables = [
+                self._prepare_arrow_table(df) for df in data_frames if len(df) > 0
+            ]
+
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                row_count = sum(
+                    self._insert_arrow_table(arrow_table)
+                    for arrow_table in arrow_tables
+                    if arrow_table is not None
+                )
+                self._upsert_file_statuses(completed_records, ProcessStatus.COMPLETED)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            logger.info(
+                f"{len(completed_records)}ファイル分のセンサーデータを {row_count} 行挿入しました"
+            )
+            return row_count
+        except Exception as e:
+            logger.error(f"センサーデータの一括挿入中にエラー: {str(e)}")
+            raise DatabaseOperationError(
+                "センサーデータの一括挿入に失敗しました",
+                operation="insert_sensor_data_batch",
+            ) from e
+
     def commit(self) -> None:
         """変更をコミットする"""
         if self.conn is None:
@@ -5,20 +5,14 @@ CSVファイルの検索、抽出、処理を統合的に行います。
 """
 
 import concurrent.futures
-import multiprocessing
 import os
-import re
-import shutil
-import signal
-import tempfile
 import threading
 import time
-from multiprocessing import Manager
 from pathlib import Path
 
 from src.config.config import config
 from src.db.db_utils import DatabaseManager
-from src.file.file_utils import FileFinder, FileHasher
+from src.file.file_utils import FileFinder, FileHasher, compile_pattern
 from src.file.zip_handler import ZipHandler
 from src.processor.csv_processor import CsvProcessor
 from src.utils.logging_config import get_logger
@@ -26,106 +20,60 @@ from src.utils.logging_config import get_logger
 # ロガーの取得
 logger = get_logger("file_processor")
 
+# 並列処理で1つのトランザクションにまとめて書き込むファイル数と経過時間（秒）の上限
+INSERT_BATCH_FILES = 100
+INSERT_BATCH_SECONDS = 5.0
 
-# スタンドアロン関数（プロセス間で共有しない）
-def process_file_standalone(
-    file_path, actual_file_path, file_hash, source_zip, meta_info, db_path
-):
+
+# スタンドアロン関数（ワーカースレッド間で状態を共有しない）
+def process_file_standalone(file_path, actual_file_path, source_zip, meta_info):
     """
-    スタンドアロンで実行できるファイル処理関数（プロセス間共有なし）
+    スタンドアロンで実行できるファイル処理関数（ワーカー間で状態を共有しない）
+
+    CSVの解析と縦持ち変換のみを行い、データベースへの書き込みは行わない。
+    書き込みは呼び出し元のスレッドが一括して行う（DuckDBへの書き込みは単一スレッドに限定する）。
 
     Parameters:
     file_path (str): ファイルのパス
-    actual_file_path (str): 実際のファイルパス（ZIP展開後など）
-    file_hash (str): ファイルハッシュ
+    actual_file_path (str): 実際のファイルパス（ZIP内のファイルの場合はZIP内パス）
     source_zip (str): 元のZIPファイルパス（なければNone）
     meta_info (dict): メタ情報
-    db_path (str): データベースファイルパス
 
     Returns:
-    dict: 処理結果
+    dict: 処理結果（成功時は "data" に処理済みのデータフレームを含む）
     """
-    import os
-    import random
-    import time
-    from pathlib import Path
-
-    from src.db.db_utils import DatabaseManager
-    from src.processor.csv_processor import CsvProcessor
-
-    # プロセス固有のデータベースファイル名を生成
-    process_id = os.getpid()
-    # 競合を避けるためにランダム要素と時間を追加
-    random_suffix = random.randint(1000, 9999)
-    timestamp = int(time.time() * 1000) % 10000
-
-    # 元のパスからディレクトリとファイル名を分離
-    db_dir = os.path.dirname(db_path)
-    db_name = os.path.basename(db_path)
-    base_name, ext = os.path.splitext(db_name)
-
-    # 一時データベースのパスを生成
-    temp_db_name = f"{base_name}_{process_id}_{timestamp}_{random_suffix}{ext}"
-    temp_db_path = os.path.join(db_dir, temp_db_name) if db_dir else temp_db_name
-
-    # 独立したデータベース接続とCSVプロセッサを作成（エンコーディングを強制）
-    db_manager = DatabaseManager(temp_db_path)
+    # CSVプロセッサを作成（エンコーディングを強制）
     csv_processor = CsvProcessor(force_encoding=True)
 
     result = {
         "success": False,
         "file_path": file_path,
         "source_zip": source_zip,
-        "file_hash": file_hash,
-        "temp_db_path": temp_db_path,  # 一時データベースのパスを結果に含める
     }
 
     try:
-        # ファイル処理前に二重チェック
-        if db_manager.is_file_processed_by_hash(file_hash):
-            result["already_processed"] = True
-            return result
+        # ZIP内のファイルはディスクに展開せず、メモリ上で処理する
+        data = ZipHandler.read_file(source_zip, file_path) if source_zip else None
 
         # ファイルを処理
-        data_df = csv_processor.process_csv_file(actual_file_path)
+        data_df = csv_processor.process_csv_file(actual_file_path, data=data)
 
         if data_df is not None:
             # メタ情報を追加
             file_info = {"file_path": file_path, "source_zip": source_zip}
             data_df = csv_processor.add_meta_info(data_df, file_info, meta_info)
 
-            # データベースに保存
-            rows_inserted = db_manager.insert_sensor_data(data_df)
-
-            # 処理済みに記録
-            source_zip_str = str(source_zip) if source_zip else None
-            db_manager.mark_file_as_completed(file_path, file_hash, source_zip_str)
-
-            # コミット
-            db_manager.commit()
+            # 同一プロセス内のスレッドで実行するため、データフレームをそのまま返す
+            result["data"] = data_df
             result["success"] = True
-            result["rows_inserted"] = rows_inserted
         else:
             print(f"エラー: {file_path} の処理結果がNoneです")
-            # 失敗状態にマーク
-            source_zip_str = str(source_zip) if source_zip else None
-            db_manager.mark_file_as_failed(file_path, file_hash, source_zip_str)
+            result["error"] = "処理結果がNoneです"
     except Exception as e:
-        # ロールバック
-        db_manager.rollback()
-
         file_name = Path(file_path).name
         source_zip_str = f" (in {source_zip})" if source_zip else ""
         print(f"エラー処理中 {file_name}{source_zip_str}: {str(e)}")
-
-        # 失敗状態にマーク
-        source_zip_str = str(source_zip) if source_zip else None
-        db_manager.mark_file_as_failed(file_path, file_hash, source_zip_str)
-
         result["error"] = str(e)
-    finally:
-        # データベース接続を閉じる
-        db_manager.close()
 
     return result
 
@@ -150,10 +98,9 @@ class FileProcessor:
         self.file_locks = {}
         self.lock_dict_lock = threading.Lock()
 
-        # プロセス間通信用のマネージャー
-        self.manager = Manager()
-        # キャンセルフラグを管理する共有辞書
-        self.cancel_flags = self.manager.dict()
+        # キャンセルフラグを管理する辞書
+        # （並列処理はスレッドで行うため、プロセス間共有のマネージャーは不要）
+        self.cancel_flags = {}
 
     def __del__(self):
         """デストラクタ"""
@@ -181,34 +128,103 @@ class FileProcessor:
 
         Parameters:
         folder_path (str or Path): 検索対象のフォルダパス
-        pattern (str): 正規表現パターン
+        pattern (str or Pattern): 正規表現パターン、またはコンパイル済みパターン
 
         Returns:
         list: [{'path': ファイルパス, 'source_zip': ZIPファイルパス（ない場合はNone）}]
         """
-        # コンパイル済み正規表現パターン
-        regex = re.compile(pattern)
+        # コンパイル済み正規表現パターン（同じパターンは再コンパイルしない）
+        regex = compile_pattern(pattern)
 
         # ファイル検索オブジェクト
-        file_finder = FileFinder(pattern)
+        file_finder = FileFinder(regex)
+
+        # 通常のCSVファイルとZIPファイルを1回の走査で検索
+        found_files, zip_paths = file_finder.scan_folder(folder_path)
+
+        # ZIPファイルの中身を確認
+        # セントラルディレクトリの読み込みはI/O待ちが主なため、スレッドで並列に行う
+        if len(zip_paths) > 1:
+            max_workers = min(32, (os.cpu_count() or 1) * 4, len(zip_paths))
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                # mapは入力順に結果を返すため、検索結果の順序は逐次処理と変わらない
+                for zip_files in executor.map(
+                    lambda zip_file: ZipHandler.find_csv_files_in_zip(zip_file, regex),
+                    zip_paths,
+                ):
+                    found_files.extend(zip_files)
+        else:
+            for zip_file in zip_paths:
+                zip_files = ZipHandler.find_csv_files_in_zip(zip_file, regex)
+                found_files.extend(zip_files)
+
+        return found_files
 
-        # 通常のCSVファイルを検索
-        found_files = file_finder.find_csv_files(folder_path)
+    def get_hash_cache_key(
+        self, file_path, source_zip=None, size=None, crc32=None, mtime_ns=None
+    ):
+        """
+        ハッシュキャッシュのキーと変更判定用の値を取得する
 
-        # ZIPファイルを検索して中身を確認
-        for zip_file in Path(folder_path).rglob("*.zip"):
-            zip_files = ZipHandler.find_csv_files_in_zip(zip_file, regex)
-            found_files.extend(zip_files)
+        Parameters:
+        file_path (str or Path): ファイルパス（ZIP内のファイルの場合はZIP内パス）
+        source_zip (str or Path, optional): 元のZIPファイルパス
+        size (int, optional): ファイルサイズ（ZIP内のファイルは展開後のサイズ。検索時に取得済みの場合）
+        crc32 (int, optional): ZIP内のファイルのCRC32（検索時に取得済みの場合）
+        mtime_ns (int, optional): 通常のファイルの更新時刻（検索時に取得済みの場合）
 
-        return found_files
+        Returns:
+        tuple: (キー, サイズ, 更新時刻（ZIP内のファイルはCRC32）)
+        """
+        if source_zip:
+            # ZIP内のファイルはセントラルディレクトリの情報（展開後サイズとCRC32）だけで変更を判定する
+            # ZIPファイル自体の更新時刻は使わない（他のファイルを追加しただけで、
+            # 変更のないファイルまでハッシュを再計算することになるため）
+            if size is None or crc32 is None:
+                zip_info = ZipHandler.get_file_info(source_zip, file_path)
+                file_path, size, crc32 = (
+                    zip_info.filename,
+                    zip_info.file_size,
+                    zip_info.CRC,
+                )
+            return f"{Path(source_zip).resolve()}!{file_path}", size, crc32
+
+        # 通常のファイルは検索時に取得したサイズと更新時刻を使い、statを呼び直さない
+        if size is None or mtime_ns is None:
+            stat = os.stat(file_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        return str(Path(file_path).resolve()), size, mtime_ns
+
+    @staticmethod
+    def compute_file_hash(file_path, source_zip=None):
+        """
+        ファイルの内容からハッシュを計算する（キャッシュは使用しない）
+
+        データベースにアクセスしないため、スレッドから並列に呼び出せる。
 
-    def process_single_file(self, file_info, temp_dir):
+        Parameters:
+        file_path (str or Path): ファイルパス（ZIP内のファイルの場合はZIP内パス）
+        source_zip (str or Path, optional): 元のZIPファイルパス
+
+        Returns:
+        str: SHA256ハッシュ値
+        """
+        # ZIP内のファイルは一時ディレクトリに展開せず、メモリ上の内容から計算する
+        if source_zip:
+            return FileHasher.get_bytes_hash(
+                ZipHandler.read_file(source_zip, file_path)
+            )
+        return FileHasher.get_file_hash(file_path)
+
+    def process_single_file(self, file_info, temp_dir=None):
         """
         単一のCSVファイルを処理する関数
 
         Parameters:
         file_info (dict): 処理するファイルの情報
-        temp_dir (Path): 一時ディレクトリのパス
+        temp_dir (Path, optional): 未使用（ZIP内のファイルはメモリ上で処理するため）
 
         Returns:
         dict: 処理結果
@@ -222,34 +238,39 @@ class FileProcessor:
 
         try:
             # ファイルを処理
-            data_df = self.csv_processor.process_csv_file(file_info["actual_file_path"])
+            # ZIP内のファイルはディスクに展開せず、メモリ上で処理する
+            data = (
+                ZipHandler.read_file(file_info["source_zip"], file_info["file_path"])
+                if file_info["source_zip"]
+                else None
+            )
+            data_df = self.csv_processor.process_csv_file(
+                file_info["actual_file_path"], data=data
+            )
             if data_df is not None:
                 # メタ情報を追加
                 data_df = self.csv_processor.add_meta_info(
                     data_df, file_info, self.meta_info
                 )
 
-                # トランザクションを開始（insert_sensor_data内で開始されるため不要）
-                # データベースに保存
-                rows_inserted = self.db_manager.insert_sensor_data(data_df)
-
-                # 処理済みに記録
-                self.db_manager.mark_file_as_processed(
-                    file_info["file_path"],
-                    file_info["file_hash"],
-                    file_info["source_zip_str"],
+                # データベースに保存し、同じトランザクションで処理済みに記録する
+                # （途中で中断しても、データだけが残って再処理時に重複することはない）
+                rows_inserted = self.db_manager.insert_sensor_data_batch(
+                    [data_df],
+                    [
+                        (
+                            file_info["file_path"],
+                            file_info["file_hash"],
+                            file_info["source_zip_str"],
+                        )
+                    ],
                 )
 
-                # コミット
-                self.db_manager.commit()
                 result["success"] = True
                 result["rows_inserted"] = rows_inserted
             else:
                 print(f"エラー: {file_info['file_path']} の処理結果がNoneです")
         except Exception as e:
-            # ロールバック
-            self.db_manager.rollback()
-
             print(
                 f"エラー処理中 {file_info['file_path']}"
                 + (
@@ -262,142 +283,47 @@ class FileProcessor:
 
         return result
 
-    def process_file_in_subprocess(
-        self, file_info, process_id, db_path, meta_info, cancel_key
-    ):
+    def write_batch(self, batch, stats):
         """
-        サブプロセスでファイルを処理する関数
+        解析済みの複数ファイルのデータを1つのトランザクションで書き込む
 
-        Parameters:
-        file_info (dict): 処理するファイルの情報
-        process_id (int): プロセスID
-        db_path (str or Path): データベースファイルのパス
-        meta_info (dict): メタ情報
-        cancel_key (str): キャンセルフラグのキー
+        一括での書き込みに失敗した場合は、ファイルごとに書き込み直す。
 
-        Returns:
-        dict: 処理結果
+        Parameters:
+        batch (list): (ファイル情報, データフレーム) のリスト
+        stats (dict): 処理結果の統計情報（この関数内で更新する）
         """
-
-        # プロセス開始時にシグナルハンドラを設定
-        def handle_termination(signum, frame):
-            print(
-                f"プロセス {process_id} がシグナル {signum} を受信しました。終了します。"
+        records = [
+            (
+                file_info["file_path"],
+                file_info["file_hash"],
+                file_info["source_zip_str"],
             )
-            # 強制終了
-            os._exit(1)
-
-        # SIGTERMシグナルのハンドラを設定
-        signal.signal(signal.SIGTERM, handle_termination)
-
-        # 各プロセス用の独立したデータベース接続を作成
-        process_db_manager = DatabaseManager(db_path)
-
-        # CSVプロセッサを作成（エンコーディングを強制）
-        csv_processor = CsvProcessor(force_encoding=True)
+            for file_info, _ in batch
+        ]
 
         try:
-            # 結果オブジェクトを初期化
-            result = {
-                "success": False,
-                "file_path": file_info["file_path"],
-                "source_zip": file_info["source_zip"],
-                "file_hash": file_info["file_hash"],
-                "process_id": process_id,
-            }
-
-            # キャンセルされていないか定期的にチェックする関数
-            # 注: この関数はダミーです。実際のキャンセルチェックはメインプロセスで行われます
-            def check_cancelled():
-                # 常にFalseを返す（キャンセルされていない）
-                # 実際のキャンセル処理はメインプロセスで行われ、タイムアウト時にプロセスが強制終了されます
-                return False
-
-            # ファイルを処理
-            data_df = csv_processor.process_csv_file(
-                file_info["actual_file_path"],
-                check_cancelled,  # キャンセルチェック関数を渡す
+            self.db_manager.insert_sensor_data_batch(
+                [data_df for _, data_df in batch], records
             )
-
-            # キャンセルされたかチェック
-            if check_cancelled():
-                print(f"プロセス {process_id}: 処理がキャンセルされました")
-                # タイムアウト状態にマーク
-                process_db_manager.mark_file_as_timeout(
-                    file_info["file_path"],
-                    file_info["file_hash"],
-                    file_info["source_zip_str"],
-                )
-                result["cancelled"] = True
-                return result
-
-            if data_df is not None:
-                # メタ情報を追加
-                data_df = csv_processor.add_meta_info(data_df, file_info, meta_info)
-
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    print(
-                        f"プロセス {process_id}: メタ情報追加後にキャンセルされました"
-                    )
-                    # タイムアウト状態にマーク
-                    process_db_manager.mark_file_as_timeout(
-                        file_info["file_path"],
-                        file_info["file_hash"],
-                        file_info["source_zip_str"],
-                    )
-                    result["cancelled"] = True
-                    return result
-
-                # データベースに保存
-                rows_inserted = process_db_manager.insert_sensor_data(data_df)
-
-                # 処理済み（完了）に記録
-                process_db_manager.mark_file_as_completed(
-                    file_info["file_path"],
-                    file_info["file_hash"],
-                    file_info["source_zip_str"],
-                )
-
-                # コミット
-                process_db_manager.commit()
-                result["success"] = True
-                result["rows_inserted"] = rows_inserted
-            else:
-                print(f"エラー: {file_info['file_path']} の処理結果がNoneです")
-                # 失敗状態にマーク
-                process_db_manager.mark_file_as_failed(
-                    file_info["file_path"],
-                    file_info["file_hash"],
-                    file_info["source_zip_str"],
-                )
+            stats["newly_processed"] += len(batch)
+            return
         except Exception as e:
-            # ロールバック
-            process_db_manager.rollback()
-
-            file_name = Path(file_info["file_path"]).name
-            print(
-                f"エラー処理中 {file_name}"
-                + (
-                    f" (in {file_info['source_zip']})"
-                    if file_info["source_zip"]
-                    else ""
-                )
-                + f": {str(e)}"
+            logger.warning(
+                f"一括書き込みに失敗したため、ファイルごとに書き込みます: {str(e)}"
             )
 
-            # 失敗状態にマーク
-            process_db_manager.mark_file_as_failed(
-                file_info["file_path"],
-                file_info["file_hash"],
-                file_info["source_zip_str"],
-            )
-
-        finally:
-            # データベース接続を閉じる
-            process_db_manager.close()
-
-        return result
+        # フォールバック：ファイルごとに挿入し、問題のあるファイルのみ失敗とする
+        # データと処理済みの記録はファイルごとに1つのトランザクションで登録する
+        # （途中で中断しても、データだけが残って再処理時に重複することはない）
+        for (file_info, data_df), record in zip(batch, records):
+            try:
+                self.db_manager.insert_sensor_data_batch([data_df], [record])
+                stats["newly_processed"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"書き込み失敗: {file_info['file_path']}: {str(e)}")
+                self.db_manager.mark_file_as_failed(*record)
 
     def process_csv_files(self, csv_files, process_all=False):
         """
@@ -420,83 +346,73 @@ class FileProcessor:
             "timeout": 0,  # タイムアウトによる失敗件数を追加
         }
 
-        # 一時ディレクトリを作成
-        temp_dir = Path(tempfile.mkdtemp())
-
         try:
             # 処理対象ファイルのリストを作成
             files_to_process = []
 
-            # 前処理：処理済みファイルのフィルタリング
+            # 新たに計算したハッシュは前処理の最後にまとめてキャッシュに登録する
+            hash_cache_records = []
+
+            # 処理済みファイルのパスとハッシュを一度だけ読み込み、以降は集合で判定する
+            if process_all:
+                processed_paths, processed_hashes = set(), set()
+            else:
+                processed_paths, processed_hashes = (
+                    self.db_manager.get_processed_file_keys()
+                )
+
+            # ハッシュキャッシュも一度だけ読み込み、ファイルごとの問い合わせを行わない
+            hash_cache = self.db_manager.get_file_hash_cache()
+
+            # 前処理1：パスによる処理済みチェックとハッシュキャッシュの参照
+            candidates = []
             for file_info in csv_files:
                 file_path = file_info["path"]
                 source_zip = file_info["source_zip"]
                 source_zip_str = str(source_zip) if source_zip else None
 
-                # パスベースで既に処理済みかチェック
-                if not process_all and self.db_manager.is_file_processed_by_path(
-                    file_path, source_zip_str
-                ):
+                # パスベースで既に処理済みかチェック（処理済みテーブルにはファイル名で記録される）
+                # ファイルごとにPathを作らないよう、ファイル名はos.path.basenameで取り出す
+                file_name = os.path.basename(file_path)
+                if (file_name, source_zip_str or "") in processed_paths:
                     stats["already_processed_by_path"] += 1
-                    file_name = Path(file_path).name
                     print(
                         f"スキップ (既処理 - ファイル名一致): {file_name}"
                         + (f" (in {source_zip})" if source_zip else "")
                     )
                     continue
 
-                # ZIPファイル内のファイルなら抽出
                 try:
-                    if source_zip:
-                        # 一時ファイルにZIPから抽出
-                        actual_file_path = ZipHandler.extract_file(
-                            source_zip, file_path, temp_dir
-                        )
-                        # 抽出したファイルが存在するか確認
-                        if not Path(actual_file_path).exists():
-                            logger.error(
-                                f"抽出されたファイルが見つかりません: {actual_file_path}"
-                            )
-                            stats["failed"] += 1
-                            continue
-                    else:
-                        actual_file_path = file_path
-                        # 通常のファイルが存在するか確認
-                        if not Path(actual_file_path).exists():
-                            logger.error(
-                                f"ファイルが見つかりません: {actual_file_path}"
-                            )
-                            stats["failed"] += 1
-                            continue
-
-                    # ファイルハッシュを計算
-                    try:
-                        file_hash = FileHasher.get_file_hash(actual_file_path)
-                    except Exception as e:
-                        logger.error(f"ファイルハッシュ計算中にエラー: {str(e)}")
-                        stats["failed"] += 1
-                        continue
-
-                    # ハッシュベースで既に処理済みかチェック
-                    if not process_all and self.db_manager.is_file_processed_by_hash(
-                        file_hash
+                    # 通常のファイルが存在するか確認（検索時にstatを取得済みの場合は不要）
+                    if (
+                        not source_zip
+                        and file_info.get("mtime_ns") is None
+                        and not Path(file_path).exists()
                     ):
-                        stats["already_processed_by_hash"] += 1
-                        file_name = Path(file_path).name
-                        print(
-                            f"スキップ (既処理 - 内容一致): {file_name}"
-                            + (f" (in {source_zip})" if source_zip else "")
-                        )
+                        logger.error(f"ファイルが見つかりません: {file_path}")
+                        stats["failed"] += 1
                         continue
 
-                    # 処理対象リストに追加
-                    files_to_process.append(
+                    # 変更のないファイル（サイズと更新時刻が一致）はキャッシュ済みのハッシュを使用
+                    cache_key, size, mtime_ns = self.get_hash_cache_key(
+                        file_path,
+                        source_zip,
+                        file_info.get("size"),
+                        file_info.get("crc32"),
+                        file_info.get("mtime_ns"),
+                    )
+                    cached = hash_cache.get(cache_key)
+                    file_hash = (
+                        cached[2] if cached and cached[:2] == (size, mtime_ns) else None
+                    )
+                    candidates.append(
                         {
                             "file_path": file_path,
-                            "actual_file_path": actual_file_path,
+                            "actual_file_path": file_path,
                             "source_zip": source_zip,
                             "source_zip_str": source_zip_str,
                             "file_hash": file_hash,
+                            "cache_record": (cache_key, size, mtime_ns),
                         }
                     )
                 except Exception as e:
@@ -508,254 +424,166 @@ class FileProcessor:
                     )
                     stats["failed"] += 1
 
+            # 前処理2：キャッシュにないファイルのハッシュを計算
+            # 読み込みとハッシュ計算はGILを解放するため、スレッドでファイルごとに並列化する
+            to_hash = [c for c in candidates if c["file_hash"] is None]
+            if to_hash:
+                max_workers = min(32, (os.cpu_count() or 1) + 4, len(to_hash))
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_workers
+                ) as executor:
+                    futures = {
+                        executor.submit(
+                            self.compute_file_hash, c["file_path"], c["source_zip"]
+                        ): c
+                        for c in to_hash
+                    }
+                    for future in concurrent.futures.as_completed(futures):
+                        candidate = futures[future]
+                        try:
+                            candidate["file_hash"] = future.result()
+                            hash_cache_records.append(
+                                (*candidate["cache_record"], candidate["file_hash"])
+                            )
+                        except Exception as e:
+                            logger.error(f"ファイルハッシュ計算中にエラー: {str(e)}")
+                            stats["failed"] += 1
+
+            # 前処理で計算したハッシュをキャッシュに一括登録
+            self.db_manager.cache_file_hashes(hash_cache_records)
+
+            # 前処理3：ハッシュによる処理済みチェック（検索結果の順序で）
+            for candidate in candidates:
+                file_hash = candidate.pop("file_hash")
+                candidate.pop("cache_record")
+                if file_hash is None:
+                    # ハッシュ計算に失敗したファイル（集計済み）
+                    continue
+
+                # ハッシュベースで既に処理済みかチェック
+                if file_hash in processed_hashes:
+                    stats["already_processed_by_hash"] += 1
+                    file_name = os.path.basename(candidate["file_path"])
+                    print(
+                        f"スキップ (既処理 - 内容一致): {file_name}"
+                        + (
+                            f" (in {candidate['source_zip']})"
+                            if candidate["source_zip"]
+                            else ""
+                        )
+                    )
+                    continue
+
+                # 処理対象リストに追加
+                candidate["file_hash"] = file_hash
+                files_to_process.append(candidate)
+
             # 並列処理の方法を選択
             # ファイル数が少ない場合は逐次処理、多い場合は並列処理
             if len(files_to_process) <= 1:
                 # 逐次処理
                 print("逐次処理を開始")
                 for file_info in files_to_process:
-                    result = self.process_single_file(file_info, temp_dir)
+                    result = self.process_single_file(file_info)
                     if result["success"]:
                         stats["newly_processed"] += 1
                     else:
                         stats["failed"] += 1
             else:
-                # 並列処理（ProcessPoolExecutorを使用）
-                max_workers = min(
-                    4, multiprocessing.cpu_count(), len(files_to_process)
-                )  # 最大値は手元のCPUコア数と4の小さい方
-                print(f"並列処理を開始: {max_workers}プロセス")
-
-                # 事前に処理済みファイルを再確認
-                for file_info in files_to_process[:]:
-                    try:
-                        # 二重チェック - 別プロセスによって処理されていないか確認
-                        if self.db_manager.is_file_processed_by_hash(
-                            file_info["file_hash"]
-                        ):
-                            stats["already_processed_by_hash"] += 1
-                            files_to_process.remove(file_info)
-                            file_name = Path(file_info["file_path"]).name
-                            print(f"スキップ (既処理 - 内容一致): {file_name}")
-                            continue
-                    except Exception as e:
-                        print(f"警告: ファイル重複チェック中にエラー: {str(e)}")
-
-                # プロセス間で共有するキャンセルフラグをクリア
+                # 並列処理（ThreadPoolExecutorを使用）
+                # PolarsのCSV解析やZIPの展開はGILを解放するため、プロセスを起動せず
+                # スレッドで並列化する（プロセス起動・データのシリアライズが不要になる）
+                # 書き込みはこのスレッドのみで行うため、ワーカー数はCPUコア数まで増やせる
+                max_workers = min(os.cpu_count() or 1, len(files_to_process))
+                print(f"並列処理を開始: {max_workers}スレッド")
+
+                # キャンセルフラグをクリア
                 self.cancel_flags.clear()
 
-                # 並列処理実行部分を修正
-                with concurrent.futures.ProcessPoolExecutor(
+                # 並列処理実行部分
+                # ワーカーはCSVの解析のみを行い、データベースへの書き込みはこのスレッドで行う
+                with concurrent.futures.ThreadPoolExecutor(
                     max_workers=max_workers
                 ) as executor:
                     # 各ファイルを並列処理
-                    futures = []
+                    futures = {}
                     for file_info in files_to_process:
-                        # ProcessPoolExecutorに渡すのは単純なデータのみ
+                        # ワーカーに渡すのは単純なデータのみ
                         future = executor.submit(
                             process_file_standalone,  # モジュールレベルの関数を使用
                             file_info["file_path"],
                             file_info["actual_file_path"],
-                            file_info["file_hash"],
                             file_info["source_zip"],
                             self.meta_info,
-                            self.db_path,
                         )
-                        futures.append(future)
+                        futures[future] = file_info
                         print(f"処理開始: {file_info['file_path']}")
 
                     # 処理中のファイル数を追跡
                     completed = 0
                     total = len(futures)
 
-                    # 成功した処理の一時データベースパスを保存するリスト
-                    successful_temp_dbs = []
+                    # 解析済みのデータは数ファイル分ずつまとめて、処理済みの記録と
+                    # 同じトランザクションで書き込む（コミットの回数を減らす）
+                    batch = []
+                    batch_started = time.monotonic()
 
-                    # 結果を集計
-                    for future in concurrent.futures.as_completed(futures):
-                        try:
-                            result = future.result(timeout=60)  # 個別のタイムアウト
-                            completed += 1
-
-                            if (
-                                "already_processed" in result
-                                and result["already_processed"]
-                            ):
-                                stats["already_processed_by_hash"] += 1
-                                print(
-                                    f"処理済みスキップ ({completed}/{total}): {result['file_path']}"
-                                )
-                            elif result["success"]:
-                                stats["newly_processed"] += 1
-                                print(
-                                    f"処理成功 ({completed}/{total}): {result['file_path']}"
-                                )
-                                # 成功した場合、一時データベースパスを保存
-                                if "temp_db_path" in result:
-                                    successful_temp_dbs.append(result["temp_db_path"])
-                            else:
-                                stats["failed"] += 1
-                                print(
-                                    f"処理失敗 ({completed}/{total}): {result['file_path']}"
-                                )
-                                if "error" in result:
-                                    print(f"  エラー内容: {result['error']}")
-                        except concurrent.futures.TimeoutError:
-                            completed += 1
-                            stats["timeout"] += 1
-                            print(f"処理タイムアウト ({completed}/{total})")
-                        except Exception as e:
-                            completed += 1
-                            stats["failed"] += 1
-                            print(f"処理例外 ({completed}/{total}): {str(e)}")
-
-                    # すべてのタスクが完了したことを確認
-                    print(f"すべてのファイル処理が完了しました: {completed}/{total}")
-
-                    # 一時データベースからメインデータベースにデータをマージ
-                    if successful_temp_dbs:
-                        total_dbs = len(successful_temp_dbs)
-                        print(
-                            f"{total_dbs}個の一時データベースからデータをマージします..."
-                        )
-                        merged_count = 0
-                        total_rows_merged = 0
-
-                        # メインデータベースのコネクションを取得
-                        main_conn = self.db_manager.conn
-
-                        for idx, temp_db_path in enumerate(successful_temp_dbs, 1):
+                    # 結果を集計し、完了したものから順にデータベースに書き込む
+                    try:
+                        for future in concurrent.futures.as_completed(futures):
+                            file_info = futures[future]
                             try:
-                                print(
-                                    f"  データベース {idx}/{total_dbs} をマージ中... ({os.path.basename(temp_db_path)})"
-                                )
-
-                                # ATTACH DATABASE コマンドを使用して一時データベースを接続
-                                temp_db_name = f"temp_db_{idx}"
-                                main_conn.execute(
-                                    f"ATTACH DATABASE '{temp_db_path}' AS {temp_db_name}"
-                                )
-
-                                try:
-                                    # トランザクションを開始
-                                    main_conn.execute("BEGIN TRANSACTION")
+                                result = future.result(timeout=60)  # 個別のタイムアウト
+                                completed += 1
 
-                                    # processed_filesテーブルのデータをマージ（SQLを使用して直接コピー）
-                                    processed_count = main_conn.execute(f"""
-                                        INSERT OR REPLACE INTO main.processed_files 
-                                        SELECT * FROM {temp_db_name}.processed_files
-                                    """).fetchone()[0]
-
-                                    print(
-                                        f"    processed_filesテーブル: {processed_count}行をマージしました"
-                                    )
-
-                                    # sensor_dataテーブルのデータをマージ（SQLを使用して直接コピー）
-                                    # 行数をカウントするためのクエリ
-                                    row_count_query = f"SELECT COUNT(*) FROM {temp_db_name}.sensor_data"
-                                    total_sensor_rows = main_conn.execute(
-                                        row_count_query
-                                    ).fetchone()[0]
-
-                                    if total_sensor_rows > 0:
-                                        print(
-                                            f"    sensor_dataテーブル: 合計{total_sensor_rows}行をマージします..."
-                                        )
-
-                                        # 大量データの場合はバッチ処理
-                                        batch_size = 10000  # バッチサイズを増やす
-                                        offset = 0
-                                        rows_processed = 0
-
-                                        while offset < total_sensor_rows:
-                                            # バッチごとにデータをコピー
-                                            batch_query = f"""
-                                                INSERT INTO main.sensor_data 
-                                                SELECT * FROM {temp_db_name}.sensor_data 
-                                                LIMIT {batch_size} OFFSET {offset}
-                                            """
-                                            main_conn.execute(batch_query)
-
-                                            # 進捗を更新
-                                            offset += batch_size
-                                            rows_processed += min(
-                                                batch_size,
-                                                total_sensor_rows
-                                                - (offset - batch_size),
-                                            )
-                                            progress = min(
-                                                100,
-                                                int(
-                                                    rows_processed
-                                                    * 100
-                                                    / total_sensor_rows
-                                                ),
-                                            )
-                                            # 進捗表示をシンプルにして余分な文字が表示されないようにする
-                                            print(
-                                                f"    データ処理: {rows_processed}/{total_sensor_rows}行 ({progress}%完了)"
-                                            )
-
-                                        total_rows_merged += total_sensor_rows
-                                        print(
-                                            f"    sensor_dataテーブル: {total_sensor_rows}行のマージが完了しました"
-                                        )
-
-                                    # トランザクションをコミット
-                                    main_conn.execute("COMMIT")
+                                if not result["success"]:
+                                    stats["failed"] += 1
                                     print(
-                                        f"    データベース {idx}/{total_dbs} のマージが完了しました"
+                                        f"処理失敗 ({completed}/{total}): {result['file_path']}"
                                     )
-
-                                except Exception as e:
-                                    # エラーが発生した場合はロールバック
-                                    main_conn.execute("ROLLBACK")
-                                    print(
-                                        f"    エラー: データベースマージ中に例外が発生しました: {str(e)}"
+                                    if "error" in result:
+                                        print(f"  エラー内容: {result['error']}")
+                                    self.db_manager.mark_file_as_failed(
+                                        file_info["file_path"],
+                                        file_info["file_hash"],
+                                        file_info["source_zip_str"],
                                     )
-                                    raise
-
-                                finally:
-                                    # 一時データベースをデタッチ
-                                    try:
-                                        main_conn.execute(
-                                            f"DETACH DATABASE {temp_db_name}"
-                                        )
-                                    except Exception as e:
-                                        print(
-                                            f"    警告: データベースのデタッチに失敗しました: {str(e)}"
-                                        )
-
-                                # 一時データベースファイルを削除
-                                try:
-                                    os.remove(temp_db_path)
-                                    print(
-                                        f"    一時データベース {os.path.basename(temp_db_path)} を削除しました"
-                                    )
-                                except Exception as e:
-                                    print(
-                                        f"    警告: 一時データベースファイルの削除中にエラー: {str(e)}"
-                                    )
-
-                                merged_count += 1
+                                    continue
 
-                            except Exception as e:
+                                # ワーカーが作成したデータフレームを書き込み待ちに追加
+                                if not batch:
+                                    batch_started = time.monotonic()
+                                batch.append((file_info, result["data"]))
                                 print(
-                                    f"  警告: 一時データベース {temp_db_path} からのマージ中にエラー: {str(e)}"
+                                    f"処理成功 ({completed}/{total}): {result['file_path']}"
                                 )
 
-                        # 最終結果を表示
-                        print(
-                            f"{merged_count}/{total_dbs}個の一時データベースからのマージが完了しました"
-                        )
-                        print(f"合計 {total_rows_merged} 行のデータがマージされました")
+                                # ファイル数か経過時間が上限に達したら書き込む
+                                if (
+                                    len(batch) >= INSERT_BATCH_FILES
+                                    or time.monotonic() - batch_started
+                                    >= INSERT_BATCH_SECONDS
+                                ):
+                                    self.write_batch(batch, stats)
+                                    batch = []
+                            except concurrent.futures.TimeoutError:
+                                completed += 1
+                                stats["timeout"] += 1
+                                print(f"処理タイムアウト ({completed}/{total})")
+                            except Exception as e:
+                                completed += 1
+                                stats["failed"] += 1
+                                print(f"処理例外 ({completed}/{total}): {str(e)}")
+                    finally:
+                        if batch:
+                            self.write_batch(batch, stats)
+
+                    # すべてのタスクが完了したことを確認
+                    print(f"すべてのファイル処理が完了しました: {completed}/{total}")
 
         finally:
-            # 一時ディレクトリを削除
-            try:
-                shutil.rmtree(temp_dir)
-            except Exception as e:
-                print(f"一時ディレクトリの削除中にエラー: {str(e)}")
+            # 検索・読み込みで開いたZIPファイルを閉じる
+            ZipHandler.close_all()
 
         return stats
 
@@ -765,7 +593,7 @@ class FileProcessor:
 
         Parameters:
         folder_path (str or Path, optional): 検索対象のフォルダパス
-        pattern (str, optional): 正規表現パターン
+        pattern (str or Pattern, optional): 正規表現パターン、またはコンパイル済みパターン
         process_all (bool): 処理済みファイルも再処理するかどうか
 
         Returns:
@@ -5,11 +5,10 @@
 """
 
 import hashlib
-import mmap
 import os
 import re
 from pathlib import Path
-from typing import Dict, List, Optional, Pattern, Union, cast
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple, Union, cast
 
 from src.utils.error_handlers import FileOperationError, safe_operation
 from src.utils.logging_config import get_logger
@@ -17,35 +16,89 @@ from src.utils.logging_config import get_logger
 # ロガーの取得
 logger = get_logger("file_utils")
 
+# コンパイル済み正規表現パターンのキャッシュ（キー: パターン文字列）
+_PATTERN_CACHE: Dict[str, Pattern[str]] = {}
+
+
+def compile_pattern(pattern: Union[str, Pattern[str]]) -> Pattern[str]:
+    """
+    正規表現パターンをコンパイルする（同じパターンは一度だけコンパイルする）
+
+    Parameters:
+        pattern (str or Pattern): 正規表現パターン、またはコンパイル済みパターン
+
+    Returns:
+        Pattern[str]: コンパイル済み正規表現パターン
+    """
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    regex = _PATTERN_CACHE.get(pattern)
+    if regex is None:
+        regex = _PATTERN_CACHE.setdefault(pattern, re.compile(pattern))
+    return regex
+
+
+def _iter_files(folder: Union[str, Path]) -> Iterator[os.DirEntry]:
+    """
+    フォルダ以下のファイルをos.scandirで再帰的に列挙する
+
+    DirEntryはディレクトリ読み込み時に種別を取得済みのため、
+    ファイルごとのstat呼び出しやPathオブジェクトの生成が不要になる。
+
+    Parameters:
+        folder (str or Path): 検索対象のフォルダパス
+
+    Yields:
+        os.DirEntry: ファイルのエントリ
+    """
+    pending = [os.fspath(folder)]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError as e:
+            # os.walkと同様に、読み込めないディレクトリはスキップする
+            logger.warning(f"ディレクトリを読み込めません: {directory} - {str(e)}")
+
 
 class FileFinder:
     """ファイル検索を行うクラス"""
 
-    def __init__(self, pattern: Optional[str] = None) -> None:
+    def __init__(self, pattern: Optional[Union[str, Pattern[str]]] = None) -> None:
         """
         初期化
 
         Parameters:
-            pattern (str, optional): 正規表現パターン
+            pattern (str or Pattern, optional): 正規表現パターン、またはコンパイル済みパターン
         """
-        self.pattern = pattern
-        self.regex: Optional[Pattern[str]] = re.compile(pattern) if pattern else None
-        logger.debug(f"FileFinder を初期化しました: pattern={pattern}")
+        self.regex: Optional[Pattern[str]] = (
+            compile_pattern(pattern) if pattern else None
+        )
+        self.pattern = self.regex.pattern if self.regex else None
+        logger.debug(f"FileFinder を初期化しました: pattern={self.pattern}")
 
-    def set_pattern(self, pattern: str) -> None:
+    def set_pattern(self, pattern: Union[str, Pattern[str]]) -> None:
         """
         検索パターンを設定する
 
         Parameters:
-            pattern (str): 正規表現パターン
+            pattern (str or Pattern): 正規表現パターン、またはコンパイル済みパターン
         """
-        self.pattern = pattern
-        self.regex = re.compile(pattern)
-        logger.debug(f"検索パターンを設定しました: {pattern}")
+        self.regex = compile_pattern(pattern)
+        self.pattern = self.regex.pattern
+        logger.debug(f"検索パターンを設定しました: {self.pattern}")
 
     def find_csv_files(
         self, folder_path: Union[str, Path]
-    ) -> List[Dict[str, Optional[Path]]]:
+    ) -> List[Dict[str, Optional[Union[Path, int]]]]:
         """
         フォルダ内から正規表現パターンに一致するCSVファイルを検索する
 
@@ -53,12 +106,37 @@ class FileFinder:
             folder_path (str or Path): 検索対象のフォルダパス
 
         Returns:
-            List[Dict[str, Optional[Path]]]: [{'path': ファイルパス, 'source_zip': None}]
+            List[Dict[str, Optional[Union[Path, int]]]]: [{'path': ファイルパス, 'source_zip': None,
+                'size': ファイルサイズ, 'mtime_ns': 更新時刻（ナノ秒）}]
 
         Raises:
             ValueError: 検索パターンが設定されていない場合
         """
-        found_files: List[Dict[str, Optional[Path]]] = []
+        found_files, _ = self.scan_folder(folder_path)
+        return found_files
+
+    def scan_folder(
+        self, folder_path: Union[str, Path]
+    ) -> Tuple[List[Dict[str, Optional[Union[Path, int]]]], List[Path]]:
+        """
+        フォルダを1回だけ走査し、パターンに一致するCSVファイルとZIPファイルを収集する
+
+        CSVファイルのサイズと更新時刻も走査時に取得し、ハッシュキャッシュの判定に使う
+        （前処理でファイルごとにstatを呼び直さないため）。
+
+        Parameters:
+            folder_path (str or Path): 検索対象のフォルダパス
+
+        Returns:
+            Tuple[List[Dict[str, Optional[Union[Path, int]]]], List[Path]]:
+                ([{'path': ファイルパス, 'source_zip': None, 'size': ファイルサイズ,
+                   'mtime_ns': 更新時刻（ナノ秒）}], [ZIPファイルパス])
+
+        Raises:
+            ValueError: 検索パターンが設定されていない場合
+        """
+        found_files: List[Dict[str, Optional[Union[Path, int]]]] = []
+        zip_files: List[Path] = []
 
         # Pathオブジェクトへ変換
         folder = Path(folder_path)
@@ -69,20 +147,39 @@ class FileFinder:
             logger.error("検索パターンが設定されていません")
             raise ValueError("検索パターンが設定されていません")
 
-        # 通常のCSVファイルを検索
+        # CSVファイルとZIPファイルを1回のディレクトリ走査で検索
         try:
-            for file in folder.rglob("*.csv"):
-                if self.regex.search(file.name):
-                    found_files.append({"path": file, "source_zip": None})
-                    logger.debug(f"CSVファイルを見つけました: {file}")
+            for entry in _iter_files(folder):
+                name = entry.name
+                if name.endswith(".csv"):
+                    if self.regex.search(name):
+                        file = Path(entry.path)
+                        file_entry: Dict[str, Optional[Union[Path, int]]] = {
+                            "path": file,
+                            "source_zip": None,
+                        }
+                        try:
+                            stat = entry.stat()
+                            file_entry["size"] = stat.st_size
+                            file_entry["mtime_ns"] = stat.st_mtime_ns
+                        except OSError:
+                            # 走査後に削除されたファイルは前処理で「見つからない」として扱う
+                            pass
+                        found_files.append(file_entry)
+                        logger.debug(f"CSVファイルを見つけました: {file}")
+                elif name.endswith(".zip"):
+                    zip_files.append(Path(entry.path))
         except Exception as e:
             logger.error(f"CSVファイル検索中にエラー: {str(e)}")
             raise FileOperationError(
                 f"CSVファイル検索中にエラー: {str(e)}", folder_path
             )
 
-        logger.info(f"{len(found_files)}個のCSVファイルが見つかりました: {folder}")
-        return found_files
+        logger.info(
+            f"{len(found_files)}個のCSVファイルと{len(zip_files)}個のZIPファイルが"
+            f"見つかりました: {folder}"
+        )
+        return found_files, zip_files
 
     def find_files_with_extension(
         self, folder_path: Union[str, Path], extension: str
@@ -136,44 +233,14 @@ class FileHasher:
         Raises:
             FileOperationError: ファイル操作中にエラーが発生した場合
         """
-        sha256_hash = hashlib.sha256()
         file_path_obj = Path(file_path)
         logger.debug(f"ファイルハッシュ計算を開始: {file_path_obj}")
 
-        # ファイルサイズを取得
         try:
-            file_size = file_path_obj.stat().st_size
-        except Exception as e:
-            logger.error(f"ファイルサイズ取得中にエラー: {str(e)}")
-            raise FileOperationError(
-                f"ファイルサイズ取得中にエラー: {str(e)}", file_path
-            )
-
-        try:
-            with open(file_path, "rb") as f:
-                # 小さなファイルは通常の方法で処理
-                if file_size < 1024 * 1024:  # 1MB未満
-                    logger.debug(
-                        f"通常の方法でハッシュ計算: {file_path_obj} (サイズ: {file_size}バイト)"
-                    )
-                    sha256_hash.update(f.read())
-                else:
-                    # 大きなファイルはメモリマッピングを使用
-                    logger.debug(
-                        f"メモリマッピングでハッシュ計算: {file_path_obj} (サイズ: {file_size}バイト)"
-                    )
-                    try:
-                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-                            # メモリマップされたファイルを直接ハッシュ計算に使用
-                            sha256_hash.update(mm)
-                    except (ValueError, OSError) as e:
-                        # mmapが使用できない場合は通常の方法にフォールバック
-                        logger.warning(
-                            f"メモリマッピングに失敗、通常の方法にフォールバック: {file_path_obj} - {str(e)}"
-                        )
-                        f.seek(0)
-                        for byte_block in iter(lambda: f.read(4096), b""):
-                            sha256_hash.update(byte_block)
+            # hashlib.file_digestはC実装の大きなバッファで読み込みながらハッシュを計算する
+            # （Python側のループやmmapの準備が不要で、計算中はGILも解放される）
+            with open(file_path, "rb", buffering=0) as f:
+                sha256_hash = hashlib.file_digest(f, "sha256")
 
             hash_value = sha256_hash.hexdigest()
             logger.debug(f"ハッシュ計算完了: {file_path_obj} -> {hash_value[:8]}...")
@@ -183,3 +250,19 @@ class FileHasher:
             raise FileOperationError(
                 f"ファイルハッシュ計算中にエラー: {str(e)}", file_path
             )
+
+    @staticmethod
+    def get_bytes_hash(data: bytes) -> str:
+        """
+        メモリ上のデータのSHA256ハッシュを計算する
+
+        ZIP内のファイルなど、ディスクに展開せずに読み込んだデータに使用する。
+        同じ内容であればget_file_hashと同じ値になる。
+
+        Parameters:
+            data (bytes): ハッシュを計算するデータ
+
+        Returns:
+            str: SHA256ハッシュ値（16進数文字列）
+        """
+        return hashlib.sha256(data).hexdigest()
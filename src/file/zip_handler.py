@@ -1,12 +1,15 @@
 """
 ZIPファイル処理モジュール
 
-ZIPファイルからのファイル抽出などの機能を提供します。
+ZIPファイル内のファイルの検索・読み込みなどの機能を提供します。
 """
 
+import contextlib
+import threading
 import zipfile
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Pattern, Union
+from typing import Dict, Iterator, List, Pattern, Union
 
 from src.utils.error_handlers import FileOperationError, safe_operation
 from src.utils.logging_config import get_logger
@@ -14,14 +17,92 @@ from src.utils.logging_config import get_logger
 # ロガーの取得
 logger = get_logger("zip_handler")
 
+# 同時に開いたままにしておくZIPファイルの最大数
+MAX_CACHED_ZIP_FILES = 32
+
 
 class ZipHandler:
     """ZIPファイル処理を行うクラス"""
 
+    # 開いたZIPファイルのキャッシュ（キー: 絶対パス）
+    # 検索時に解析したセントラルディレクトリを読み込み時にも再利用する
+    # （ハッシュ計算・検索・解析の各スレッドから同時に使われるため、ロックで保護する）
+    _zip_cache: "OrderedDict[str, zipfile.ZipFile]" = OrderedDict()
+    _zip_cache_lock = threading.Lock()
+    # 使用中のZIPファイルと利用者数（使用中のハンドルはキャッシュから閉じない）
+    _zip_users: Dict[zipfile.ZipFile, int] = {}
+
+    @classmethod
+    @contextlib.contextmanager
+    def open_zip(cls, zip_path: Union[str, Path]) -> Iterator[zipfile.ZipFile]:
+        """
+        ZIPファイルを開く（キャッシュ済みの場合は再利用する）
+
+        複数のスレッドから同時に使われるため、使用中のハンドルは数えておき、
+        キャッシュの上限を超えても使用中のものは閉じない。
+
+        Parameters:
+            zip_path (str or Path): ZIPファイルのパス
+
+        Yields:
+            zipfile.ZipFile: 開かれたZIPファイル
+
+        Raises:
+            zipfile.BadZipFile: 無効なZIPファイルの場合
+        """
+        key = str(Path(zip_path).resolve())
+        with cls._zip_cache_lock:
+            zip_ref = cls._zip_cache.get(key)
+            if zip_ref is not None:
+                # 最近使用したものとして末尾に移動
+                cls._zip_cache.move_to_end(key)
+            else:
+                zip_ref = zipfile.ZipFile(zip_path, "r")
+                cls._zip_cache[key] = zip_ref
+                logger.debug(f"ZIPファイルを開きました: {key}")
+            cls._zip_users[zip_ref] = cls._zip_users.get(zip_ref, 0) + 1
+
+            # 上限を超えた場合は、使用中でないものを古い順に閉じる
+            excess = len(cls._zip_cache) - MAX_CACHED_ZIP_FILES
+            if excess > 0:
+                idle_keys = [
+                    old_key
+                    for old_key, old_zip in cls._zip_cache.items()
+                    if old_zip not in cls._zip_users
+                ]
+                for old_key in idle_keys[:excess]:
+                    cls._zip_cache.pop(old_key).close()
+                    logger.debug(f"キャッシュからZIPファイルを閉じました: {old_key}")
+
+        try:
+            yield zip_ref
+        finally:
+            with cls._zip_cache_lock:
+                users = cls._zip_users.pop(zip_ref) - 1
+                if users > 0:
+                    cls._zip_users[zip_ref] = users
+                elif cls._zip_cache.get(key) is not zip_ref:
+                    # 使用中にキャッシュから外された（close_allなど）場合は、最後の利用者が閉じる
+                    zip_ref.close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """キャッシュされているすべてのZIPファイルを閉じる"""
+        with cls._zip_cache_lock:
+            while cls._zip_cache:
+                key, zip_ref = cls._zip_cache.popitem()
+                if zip_ref in cls._zip_users:
+                    # 使用中のものは、最後の利用者が使い終わった時点で閉じる
+                    continue
+                try:
+                    zip_ref.close()
+                except Exception as e:
+                    logger.warning(f"ZIPファイルのクローズ中にエラー: {key} - {str(e)}")
+
     @staticmethod
     def find_csv_files_in_zip(
         zip_path: Union[str, Path], pattern_regex: Pattern[str]
-    ) -> List[Dict[str, Union[str, Path]]]:
+    ) -> List[Dict[str, Union[str, Path, int]]]:
         """
         ZIPファイル内から正規表現パターンに一致するCSVファイルを検索する
 
@@ -30,25 +111,31 @@ class ZipHandler:
             pattern_regex (Pattern): コンパイル済み正規表現パターン
 
         Returns:
-            List[Dict[str, Union[str, Path]]]: [{'path': ファイルパス, 'source_zip': ZIPファイルパス}]
+            List[Dict[str, Union[str, Path, int]]]: [{'path': ファイルパス, 'source_zip': ZIPファイルパス,
+                'size': 展開後のサイズ, 'crc32': CRC32}]
         """
-        found_files: List[Dict[str, Union[str, Path]]] = []
+        found_files: List[Dict[str, Union[str, Path, int]]] = []
         zip_path_obj = Path(zip_path)
         logger.debug(f"ZIPファイル内のCSVファイル検索を開始: {zip_path_obj}")
 
         try:
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                # ZIPファイル内のファイル一覧を取得
-                zip_contents = zip_ref.namelist()
-                logger.debug(f"ZIPファイル内のファイル数: {len(zip_contents)}")
-
+            with ZipHandler.open_zip(zip_path) as zip_ref:
                 # CSVファイルかつ条件に合うものを抽出
-                for file_in_zip in zip_contents:
-                    if file_in_zip.endswith(".csv") and pattern_regex.search(
-                        Path(file_in_zip).name
-                    ):
+                # （ファイル名リストを別途作らず、エントリ情報を直接走査する）
+                # エントリごとにPathを作らないよう、ファイル名は文字列操作で取り出す
+                for info in zip_ref.infolist():
+                    file_in_zip = info.filename
+                    if not file_in_zip.endswith(".csv"):
+                        continue
+                    if pattern_regex.search(file_in_zip.rsplit("/", 1)[-1]):
+                        # サイズとCRC32はセントラルディレクトリにあるため、展開せずに記録できる
                         found_files.append(
-                            {"path": file_in_zip, "source_zip": zip_path}
+                            {
+                                "path": file_in_zip,
+                                "source_zip": zip_path,
+                                "size": info.file_size,
+                                "crc32": info.CRC,
+                            }
                         )
                         logger.debug(
                             f"ZIPファイル内のCSVファイルを見つけました: {file_in_zip}"
@@ -65,154 +152,105 @@ class ZipHandler:
         return found_files
 
     @staticmethod
-    @safe_operation("ZIPファイル抽出", reraise=True)
-    def extract_file(
-        zip_path: Union[str, Path], file_path: str, output_dir: Union[str, Path]
-    ) -> Path:
+    def _find_member(zip_ref: zipfile.ZipFile, file_path: str) -> zipfile.ZipInfo:
         """
-        ZIPファイルから特定のファイルを抽出する
+        ZIP内のファイルのエントリ情報を探す
 
         Parameters:
-            zip_path (str or Path): ZIPファイルのパス
-            file_path (str): 抽出するファイルのZIP内パス
-            output_dir (str or Path): 出力先ディレクトリ
+            zip_ref (zipfile.ZipFile): 開かれたZIPファイル
+            file_path (str): ZIP内パス
 
         Returns:
-            Path: 抽出されたファイルのパス
+            zipfile.ZipInfo: エントリ情報
 
         Raises:
             FileNotFoundError: ファイルが見つからない場合
-            zipfile.BadZipFile: 無効なZIPファイルの場合
-            FileOperationError: その他のファイル操作エラー
         """
-        # 出力ディレクトリの確認と作成
-        output_dir_obj = Path(output_dir)
-        output_dir_obj.mkdir(parents=True, exist_ok=True)
-        zip_path_obj = Path(zip_path)
+        # ZIP内のパスを正規化し、まずそのままのパスで探す
+        normalized_path = file_path.replace("\\", "/")
+        try:
+            return zip_ref.getinfo(normalized_path)
+        except KeyError:
+            pass
 
+        # 正確なパスでなければ、ファイル名でマッチするものを探す
+        file_name = Path(normalized_path).name
         logger.debug(
-            f"ZIPファイルからファイルを抽出: {zip_path_obj} -> {file_path} (出力先: {output_dir_obj})"
+            f"パス {normalized_path} が見つかりません。ファイル名 {file_name} で検索します"
         )
+        for info in zip_ref.infolist():
+            zip_file_path = info.filename.replace("\\", "/")
+            if zip_file_path.endswith("/" + file_name) or zip_file_path == file_name:
+                return info
 
+        error_msg = f"ZIPファイル内に {file_path} または {file_name} が見つかりません。"
+        logger.error(error_msg)
+        raise FileNotFoundError(error_msg)
+
+    @staticmethod
+    @safe_operation("ZIPファイル情報取得", reraise=True)
+    def get_file_info(zip_path: Union[str, Path], file_path: str) -> zipfile.ZipInfo:
+        """
+        ZIP内のファイルのエントリ情報（サイズ・CRC32など）を展開せずに取得する
+
+        Parameters:
+            zip_path (str or Path): ZIPファイルのパス
+            file_path (str): ZIP内パス
+
+        Returns:
+            zipfile.ZipInfo: エントリ情報
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            FileOperationError: その他のファイル操作エラー
+        """
         try:
-            # ZIPファイルを開いて処理
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                # ZIPファイル内のファイルパスを正規化
-                normalized_path = file_path.replace("\\", "/")
-                logger.debug(f"正規化されたパス: {normalized_path}")
+            with ZipHandler.open_zip(zip_path) as zip_ref:
+                return ZipHandler._find_member(zip_ref, file_path)
+        except zipfile.BadZipFile as e:
+            logger.error(f"無効なZIPファイル: {zip_path} - {str(e)}")
+            raise FileOperationError(f"無効なZIPファイル: {str(e)}", zip_path)
+
+    @staticmethod
+    @safe_operation("ZIPファイル読み込み", reraise=True)
+    def read_file(zip_path: Union[str, Path], file_path: str) -> bytes:
+        """
+        ZIPファイル内の特定のファイルをディスクに展開せずメモリに読み込む
+
+        Parameters:
+            zip_path (str or Path): ZIPファイルのパス
+            file_path (str): 読み込むファイルのZIP内パス
 
-                # ファイル名のみを取得
-                file_name = Path(normalized_path).name
+        Returns:
+            bytes: 展開されたファイルの内容
 
-                # 出力先のフルパス
-                output_path = output_dir_obj / file_name
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            FileOperationError: その他のファイル操作エラー
+        """
+        zip_path_obj = Path(zip_path)
+        logger.debug(
+            f"ZIPファイルからファイルを読み込み: {zip_path_obj} -> {file_path}"
+        )
 
-                # ファイルを抽出
-                try:
-                    # まずそのままのパスで試す
-                    logger.debug(f"パス {normalized_path} で抽出を試みます")
-                    zip_ref.extract(normalized_path, output_dir_obj)
-
-                    # 抽出したファイルが実際に存在するか確認
-                    if "/" in normalized_path:
-                        extracted_path = output_dir_obj / normalized_path
-                        if not extracted_path.exists():
-                            logger.warning(
-                                f"抽出されたはずのファイルが見つかりません: {extracted_path}"
-                            )
-                            # 代替パスを試す
-                            alt_path = output_dir_obj / file_name
-                            if alt_path.exists():
-                                logger.info(
-                                    f"代替パスでファイルを見つけました: {alt_path}"
-                                )
-                                return alt_path
-                            else:
-                                logger.error(
-                                    f"抽出されたファイルが見つかりません: {extracted_path} も {alt_path} も存在しません"
-                                )
-                                raise FileNotFoundError(
-                                    f"抽出されたファイルが見つかりません: {extracted_path}"
-                                )
-                        logger.info(f"ファイルを抽出しました: {extracted_path}")
-                        return extracted_path
-
-                    # ファイルの存在確認
-                    if not output_path.exists():
-                        logger.warning(
-                            f"抽出されたはずのファイルが見つかりません: {output_path}"
-                        )
-                        raise FileNotFoundError(
-                            f"抽出されたファイルが見つかりません: {output_path}"
-                        )
+        try:
+            # ZIPファイルを開いて処理（検索時に開いたものを再利用）
+            with ZipHandler.open_zip(zip_path) as zip_ref:
+                zip_info = ZipHandler._find_member(zip_ref, file_path)
+                content = zip_ref.read(zip_info)
 
-                    logger.info(f"ファイルを抽出しました: {output_path}")
-                    return output_path
-                except KeyError:
-                    # 正確なパスでなければ、ファイル名でマッチするものを探す
-                    logger.debug(
-                        f"パス {normalized_path} が見つかりません。ファイル名 {file_name} で検索します"
-                    )
-                    found = False
-                    for zip_info in zip_ref.infolist():
-                        zip_file_path = zip_info.filename.replace("\\", "/")
-                        if (
-                            zip_file_path.endswith("/" + file_name)
-                            or zip_file_path == file_name
-                        ):
-                            # 見つかったファイルを抽出
-                            logger.debug(
-                                f"ファイル名 {file_name} に一致するファイルを見つけました: {zip_file_path}"
-                            )
-                            zip_ref.extract(zip_info, output_dir_obj)
-                            found = True
-
-                            # 抽出されたファイルのパスを返す
-                            if "/" in zip_info.filename:
-                                extracted_path = output_dir_obj / zip_info.filename
-                                # ファイルの存在確認
-                                if not extracted_path.exists():
-                                    logger.warning(
-                                        f"抽出されたはずのファイルが見つかりません: {extracted_path}"
-                                    )
-                                    # 代替パスを試す
-                                    if output_path.exists():
-                                        logger.info(
-                                            f"代替パスでファイルを見つけました: {output_path}"
-                                        )
-                                        return output_path
-                                    else:
-                                        logger.error(
-                                            f"抽出されたファイルが見つかりません: {extracted_path} も {output_path} も存在しません"
-                                        )
-                                        raise FileNotFoundError(
-                                            f"抽出されたファイルが見つかりません: {extracted_path}"
-                                        )
-                                logger.info(f"ファイルを抽出しました: {extracted_path}")
-                                return extracted_path
-
-                            # ファイルの存在確認
-                            if not output_path.exists():
-                                logger.warning(
-                                    f"抽出されたはずのファイルが見つかりません: {output_path}"
-                                )
-                                raise FileNotFoundError(
-                                    f"抽出されたファイルが見つかりません: {output_path}"
-                                )
-
-                            logger.info(f"ファイルを抽出しました: {output_path}")
-                            return output_path
-
-                    # ファイルが見つからない場合はエラー
-                    error_msg = f"ZIPファイル内に {file_path} または {file_name} が見つかりません。"
-                    logger.error(error_msg)
-                    raise FileNotFoundError(error_msg)
+            logger.debug(
+                f"ファイルを読み込みました: {zip_info.filename} ({len(content)}バイト)"
+            )
+            return content
         except zipfile.BadZipFile as e:
             logger.error(f"無効なZIPファイル: {zip_path_obj} - {str(e)}")
             raise FileOperationError(f"無効なZIPファイル: {str(e)}", zip_path)
-        except FileNotFoundError as e:
+        except FileNotFoundError:
             # FileNotFoundErrorはそのまま再送出
             raise
         except Exception as e:
-            logger.error(f"ZIPファイル抽出中にエラー: {str(e)}")
-            raise FileOperationError(f"ZIPファイル抽出中にエラー: {str(e)}", zip_path)
+            logger.error(f"ZIPファイル読み込み中にエラー: {str(e)}")
+            raise FileOperationError(
+                f"ZIPファイル読み込み中にエラー: {str(e)}", zip_path
+            )
@@ -13,6 +13,7 @@ from typing import Dict, Optional, Union
 
 from src.config.config import config
 from src.file.file_processor import FileProcessor
+from src.file.file_utils import compile_pattern
 from src.utils.logging_config import get_logger
 
 # ロガーの取得
@@ -140,7 +141,9 @@ def main() -> None:
         logger.info(
             f"フォルダ {args.folder} のCSVファイルを処理します（パターン: {args.pattern}）"
         )
-        stats = processor.process_folder(args.folder, args.pattern, args.process_all)
+        # ファイル名の検索パターンは起動時に一度だけコンパイルして渡す
+        pattern = compile_pattern(args.pattern)
+        stats = processor.process_folder(args.folder, pattern, args.process_all)
 
         # 結果の表示
         logger.info("\n---- 処理結果 ----")
@@ -5,20 +5,24 @@ CSVファイルの読み込み、データ変換などの機能を提供しま
 """
 
 import codecs
+import io
 import os
 import tempfile
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union, cast
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union, cast
 
 import polars as pl
 
 from src.config.config import config
-from src.utils.error_handlers import FileOperationError, temp_file
+from src.utils.error_handlers import FileOperationError
 from src.utils.logging_config import get_logger
 
 # ロガーの取得
 logger = get_logger("csv_processor")
 
+# エンコーディング変換時に一度に読み込むブロックサイズ（1 MiB）
+TRANSCODE_BLOCK_SIZE = 1 << 20
+
 
 class CsvProcessor:
     """CSVファイル処理を行うクラス"""
@@ -39,10 +43,56 @@ class CsvProcessor:
             f"CsvProcessor を初期化しました: encoding={self.encoding}, force_encoding={self.force_encoding}"
         )
 
+    @staticmethod
+    def _open_source(file_path: Union[str, Path], data: Optional[bytes]) -> BinaryIO:
+        """
+        CSVの元データをバイナリストリームとして開く
+
+        Parameters:
+            file_path (str or Path): CSVファイルのパス
+            data (bytes, optional): メモリ上のCSVデータ（指定時はファイルを読まない）
+
+        Returns:
+            BinaryIO: バイナリストリーム
+        """
+        if data is not None:
+            return io.BytesIO(data)
+        return open(file_path, "rb")
+
+    @staticmethod
+    def _transcode_to_utf8(src_file: BinaryIO, encoding: str) -> bytes:
+        """
+        バイナリストリームを固定サイズのブロックごとにデコードし、UTF-8に変換する
+
+        ファイル全体の文字列（str）を作らないため、変換中のメモリ使用量を抑えられる。
+        デコードできないバイトは置換文字に置き換える。
+
+        Parameters:
+            src_file (BinaryIO): 元データのバイナリストリーム
+            encoding (str): 元データのエンコーディング
+
+        Returns:
+            bytes: UTF-8に変換したデータ
+
+        Raises:
+            LookupError: 未知のエンコーディングの場合
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        output = io.BytesIO()
+        while True:
+            block = src_file.read(TRANSCODE_BLOCK_SIZE)
+            if not block:
+                break
+            output.write(decoder.decode(block).encode("utf-8"))
+        # マルチバイト文字の途中で終わった残りを出力する
+        output.write(decoder.decode(b"", final=True).encode("utf-8"))
+        return output.getvalue()
+
     def process_csv_file(
         self,
         file_path: Union[str, Path],
         check_cancelled: Optional[Callable[[], bool]] = None,
+        data: Optional[bytes] = None,
     ) -> Optional[pl.DataFrame]:
         """
         CSVファイルを処理する
@@ -50,6 +100,8 @@ class CsvProcessor:
         Parameters:
             file_path (str or Path): 処理するCSVファイルのパス
             check_cancelled (callable, optional): キャンセルされたかどうかをチェックする関数
+            data (bytes, optional): メモリ上のCSVデータ（ZIP内のファイルなど）。
+                指定した場合はfile_pathを読まずにこのデータを処理する
 
         Returns:
             pl.DataFrame or None: 処理されたデータフレーム、キャンセルされた場合はNone
@@ -69,258 +121,225 @@ class CsvProcessor:
         # ファイル全体を一度に読み込む
         encoding = self.encoding
 
-        # 一時ファイルのパス（初期値はNone）
-        temp_path: Optional[Path] = None
+        # UTF-8に変換したCSVデータ
+        # 一時ファイルには書き出さず、ヘッダーとデータ部分の読み込みで同じバッファを共有する
+        utf8_data = b""
 
         try:
-            # 一時ファイルを作成
-            with temp_file(suffix=".csv") as temp_file_path:
-                temp_path = temp_file_path
-                logger.debug(f"一時ファイルを作成: {temp_path}")
-
-                # エンコーディングを強制するかどうかで処理を分岐
-                if self.force_encoding:
-                    logger.info(f"エンコーディングを強制: {self.encoding}")
+            # エンコーディングを強制するかどうかで処理を分岐
+            if self.force_encoding:
+                logger.info(f"エンコーディングを強制: {self.encoding}")
+                try:
+                    # バイナリモードで読み込み、指定されたエンコーディングからブロック単位でUTF-8に変換
+                    logger.debug(f"バイナリモードで読み込み開始: {file_path_obj}")
                     try:
-                        # バイナリモードで読み込み
-                        logger.debug(f"バイナリモードで読み込み開始: {file_path_obj}")
-                        with open(file_path, "rb") as src_file:
-                            content = src_file.read()
-
-                            # 指定されたエンコーディングでデコード
-                            try:
-                                decoded = content.decode(
-                                    self.encoding, errors="replace"
-                                )
-                                logger.info(
-                                    f"エンコーディング {self.encoding} でデコードしました（エラーは置換）"
-                                )
-                            except Exception as e:
-                                logger.error(
-                                    f"{self.encoding}でのデコード中にエラー: {str(e)}"
-                                )
-                                # 最終手段としてlatin-1を使用
-                                decoded = content.decode("latin-1", errors="replace")
-                                logger.warning(
-                                    f"警告: latin-1でエラーを置換してデコードしました"
-                                )
-
-                            # デコードしたデータをUTF-8で一時ファイルに保存
-                            with open(temp_path, "w", encoding="utf-8") as dest_file:
-                                dest_file.write(decoded)
-                                logger.debug(
-                                    f"デコードしたデータを一時ファイルに保存: {temp_path}"
-                                )
-                    except Exception as e:
-                        logger.error(f"ファイル読み込み中にエラー: {str(e)}")
-                        # 最終手段：バイナリデータをそのまま書き込む
-                        with open(file_path, "rb") as src_file:
-                            content = src_file.read()
-                        with open(temp_path, "wb") as dest_file:
-                            dest_file.write(content)
+                        with self._open_source(file_path, data) as src_file:
+                            utf8_data = self._transcode_to_utf8(src_file, self.encoding)
+                        logger.info(
+                            f"エンコーディング {self.encoding} でデコードしました（エラーは置換）"
+                        )
+                    except LookupError as e:
+                        logger.error(f"{self.encoding}でのデコード中にエラー: {str(e)}")
+                        # 最終手段としてlatin-1を使用
+                        with self._open_source(file_path, data) as src_file:
+                            utf8_data = self._transcode_to_utf8(src_file, "latin-1")
                         logger.warning(
-                            "最終手段: バイナリデータをそのまま書き込みました"
+                            f"警告: latin-1でエラーを置換してデコードしました"
+                        )
+                    logger.debug("デコードしたデータをUTF-8に変換しました")
+                except Exception as e:
+                    logger.error(f"ファイル読み込み中にエラー: {str(e)}")
+                    # 最終手段：バイナリデータをそのまま使用する
+                    with self._open_source(file_path, data) as src_file:
+                        utf8_data = src_file.read()
+                    logger.warning("最終手段: バイナリデータをそのまま使用します")
+                    # 以降の処理ではutf8-lossyを使用
+                    encoding = "utf8-lossy"
+            else:
+                # 既存の自動検出ロジック
+                # まずエンコーディングを検出してみる
+                detected_encoding = None
+                try:
+                    # ファイルの先頭部分を読み込んでエンコーディングを推測
+                    with self._open_source(file_path, data) as f:
+                        raw_data = f.read(
+                            8192
+                        )  # 先頭8KBを読み込む（より多くのデータを検査）
+                        logger.debug(
+                            f"ファイルの先頭8KBを読み込みました: {file_path_obj}"
                         )
-                        # 以降の処理ではutf8-lossyを使用
-                        encoding = "utf8-lossy"
-                else:
-                    # 既存の自動検出ロジック
-                    # まずエンコーディングを検出してみる
-                    detected_encoding = None
-                    try:
-                        # ファイルの先頭部分を読み込んでエンコーディングを推測
-                        with open(file_path, "rb") as f:
-                            raw_data = f.read(
-                                8192
-                            )  # 先頭8KBを読み込む（より多くのデータを検査）
-                            logger.debug(
-                                f"ファイルの先頭8KBを読み込みました: {file_path_obj}"
-                            )
-
-                            # BOMの検出
-                            if raw_data.startswith(codecs.BOM_UTF8):
-                                detected_encoding = "utf-8-sig"
-                                logger.debug("BOMを検出: UTF-8 with BOM")
-                            elif raw_data.startswith(codecs.BOM_UTF16_LE):
-                                detected_encoding = "utf-16-le"
-                                logger.debug("BOMを検出: UTF-16 LE")
-                            elif raw_data.startswith(codecs.BOM_UTF16_BE):
-                                detected_encoding = "utf-16-be"
-                                logger.debug("BOMを検出: UTF-16 BE")
-
-                            # 日本語エンコーディングの特徴を検出（改善版）
-                            if not detected_encoding:
-                                # 日本語エンコーディングを検出するための優先順位付きリスト
-                                encodings_to_try = [
-                                    "cp932",
-                                    "shift-jis",
-                                    "euc-jp",
-                                    "utf-8",
-                                ]
-
-                                # 各エンコーディングを試す
-                                for enc in encodings_to_try:
-                                    try:
-                                        # サンプルデータをデコードしてみる
-                                        raw_data.decode(enc)
-                                        detected_encoding = enc
-                                        logger.debug(f"{enc}としてデコード可能")
-                                        break
-                                    except UnicodeDecodeError:
-                                        continue
-
-                                # どのエンコーディングでもデコードできなかった場合
-                                if not detected_encoding:
-                                    # CP932（Windows版Shift-JIS）を優先的に使用
-                                    detected_encoding = "cp932"
-                                    logger.debug(
-                                        f"エンコーディング検出失敗、CP932を使用"
-                                    )
-                    except Exception as e:
-                        logger.error(f"エンコーディング検出中にエラー: {str(e)}")
-                        detected_encoding = encoding
-
-                    logger.info(f"検出されたエンコーディング: {detected_encoding}")
-
-                    # 検出されたエンコーディングでファイルを読み込む
-                    try:
-                        # バイナリモードで読み込み、より堅牢な変換を行う
-                        logger.debug(f"バイナリモードで読み込み開始: {file_path_obj}")
-                        with open(file_path, "rb") as src_file:
-                            content = src_file.read()
 
-                            # 優先順位を付けた複数のエンコーディングを試す
-                            # CP932（Windows版Shift-JIS）を最初に試す
+                        # BOMの検出
+                        if raw_data.startswith(codecs.BOM_UTF8):
+                            detected_encoding = "utf-8-sig"
+                            logger.debug("BOMを検出: UTF-8 with BOM")
+                        elif raw_data.startswith(codecs.BOM_UTF16_LE):
+                            detected_encoding = "utf-16-le"
+                            logger.debug("BOMを検出: UTF-16 LE")
+                        elif raw_data.startswith(codecs.BOM_UTF16_BE):
+                            detected_encoding = "utf-16-be"
+                            logger.debug("BOMを検出: UTF-16 BE")
+
+                        # 日本語エンコーディングの特徴を検出（改善版）
+                        if not detected_encoding:
+                            # 日本語エンコーディングを検出するための優先順位付きリスト
                             encodings_to_try = [
                                 "cp932",
                                 "shift-jis",
                                 "euc-jp",
                                 "utf-8",
-                                "iso-2022-jp",
-                                "latin-1",
                             ]
-                            decoded = None
 
+                            # 各エンコーディングを試す
                             for enc in encodings_to_try:
                                 try:
-                                    # まずstrictモードで試す
-                                    decoded = content.decode(enc, errors="strict")
-                                    logger.info(
-                                        f"エンコーディング {enc} で正常にデコードできました"
-                                    )
+                                    # サンプルデータをデコードしてみる
+                                    raw_data.decode(enc)
+                                    detected_encoding = enc
+                                    logger.debug(f"{enc}としてデコード可能")
                                     break
-                                except UnicodeDecodeError as e:
-                                    # エラー位置を記録
-                                    error_pos = e.start if hasattr(e, "start") else -1
-                                    logger.debug(
-                                        f"エンコーディング {enc} でデコード失敗 (位置: {error_pos})"
-                                    )
-
-                                    # 特定の位置でエラーが発生した場合、部分的なデコードを試みる
-                                    if error_pos > 0:
-                                        try:
-                                            # エラー位置までをデコード
-                                            partial_content = content[:error_pos]
-                                            partial_decoded = partial_content.decode(
-                                                enc, errors="strict"
-                                            )
-                                            logger.debug(
-                                                f"位置 {error_pos} までは {enc} でデコード可能"
-                                            )
-
-                                            # 残りをreplaceモードでデコード
-                                            remaining = content[error_pos:]
-                                            remaining_decoded = remaining.decode(
-                                                enc, errors="replace"
-                                            )
-
-                                            # 結合
-                                            decoded = (
-                                                partial_decoded + remaining_decoded
-                                            )
-                                            logger.info(
-                                                f"エンコーディング {enc} で部分的にデコードし、残りは置換しました"
-                                            )
-                                            break
-                                        except Exception as partial_e:
-                                            logger.debug(
-                                                f"部分デコード失敗: {str(partial_e)}"
-                                            )
+                                except UnicodeDecodeError:
                                     continue
 
-                            if decoded is None:
-                                # どのエンコーディングでもデコードできない場合は、CP932でreplaceモードを使用
-                                decoded = content.decode("cp932", errors="replace")
-                                logger.warning(
-                                    f"警告: CP932でエラーを置換してデコードしました"
+                            # どのエンコーディングでもデコードできなかった場合
+                            if not detected_encoding:
+                                # CP932（Windows版Shift-JIS）を優先的に使用
+                                detected_encoding = "cp932"
+                                logger.debug(f"エンコーディング検出失敗、CP932を使用")
+                except Exception as e:
+                    logger.error(f"エンコーディング検出中にエラー: {str(e)}")
+                    detected_encoding = encoding
+
+                logger.info(f"検出されたエンコーディング: {detected_encoding}")
+
+                # 検出されたエンコーディングでファイルを読み込む
+                try:
+                    # バイナリモードで読み込み、より堅牢な変換を行う
+                    logger.debug(f"バイナリモードで読み込み開始: {file_path_obj}")
+                    with self._open_source(file_path, data) as src_file:
+                        content = src_file.read()
+
+                        # 優先順位を付けた複数のエンコーディングを試す
+                        # CP932（Windows版Shift-JIS）を最初に試す
+                        encodings_to_try = [
+                            "cp932",
+                            "shift-jis",
+                            "euc-jp",
+                            "utf-8",
+                            "iso-2022-jp",
+                            "latin-1",
+                        ]
+                        decoded = None
+
+                        for enc in encodings_to_try:
+                            try:
+                                # まずstrictモードで試す
+                                decoded = content.decode(enc, errors="strict")
+                                logger.info(
+                                    f"エンコーディング {enc} で正常にデコードできました"
                                 )
-
-                            # デコードしたデータをUTF-8で一時ファイルに保存
-                            with open(temp_path, "w", encoding="utf-8") as dest_file:
-                                dest_file.write(decoded)
+                                break
+                            except UnicodeDecodeError as e:
+                                # エラー位置を記録
+                                error_pos = e.start if hasattr(e, "start") else -1
                                 logger.debug(
-                                    f"デコードしたデータを一時ファイルに保存: {temp_path}"
+                                    f"エンコーディング {enc} でデコード失敗 (位置: {error_pos})"
                                 )
-                    except Exception as e:
-                        logger.error(f"ファイル読み込み中にエラー: {str(e)}")
-                        # 最終手段：バイナリデータをそのまま書き込み、Polarsのutf8-lossyで処理
-                        logger.warning(
-                            "最終手段: バイナリデータをそのまま書き込み、utf8-lossyで処理"
-                        )
-                        try:
-                            # 一度latin-1でデコードしてからUTF-8にエンコードし直す
-                            # （latin-1は任意のバイト列を文字にマッピングできる）
-                            with open(file_path, "rb") as src_file:
-                                content = src_file.read()
-                                decoded = content.decode("latin-1")
-
-                            with open(temp_path, "w", encoding="utf-8") as dest_file:
-                                dest_file.write(decoded)
-                                logger.debug(
-                                    f"latin-1経由でUTF-8に変換して保存: {temp_path}"
-                                )
-                        except Exception as e2:
-                            logger.error(f"latin-1変換も失敗: {str(e2)}")
-                            # 本当の最終手段：バイナリデータをそのまま書き込む
-                            with open(file_path, "rb") as src_file:
-                                content = src_file.read()
-                            with open(temp_path, "wb") as dest_file:
-                                dest_file.write(content)
-
-                        # 以降の処理ではutf8-lossyを使用
-                        encoding = "utf8-lossy"
-
-                # 一時ファイルを処理対象に変更
-                file_path = temp_path
-                # 以降の処理ではUTF-8として扱う
+
+                                # 特定の位置でエラーが発生した場合、部分的なデコードを試みる
+                                if error_pos > 0:
+                                    try:
+                                        # エラー位置までをデコード
+                                        partial_content = content[:error_pos]
+                                        partial_decoded = partial_content.decode(
+                                            enc, errors="strict"
+                                        )
+                                        logger.debug(
+                                            f"位置 {error_pos} までは {enc} でデコード可能"
+                                        )
+
+                                        # 残りをreplaceモードでデコード
+                                        remaining = content[error_pos:]
+                                        remaining_decoded = remaining.decode(
+                                            enc, errors="replace"
+                                        )
+
+                                        # 結合
+                                        decoded = partial_decoded + remaining_decoded
+                                        logger.info(
+                                            f"エンコーディング {enc} で部分的にデコードし、残りは置換しました"
+                                        )
+                                        break
+                                    except Exception as partial_e:
+                                        logger.debug(
+                                            f"部分デコード失敗: {str(partial_e)}"
+                                        )
+                                continue
+
+                        if decoded is None:
+                            # どのエンコーディングでもデコードできない場合は、CP932でreplaceモードを使用
+                            decoded = content.decode("cp932", errors="replace")
+                            logger.warning(
+                                f"警告: CP932でエラーを置換してデコードしました"
+                            )
+
+                        # デコードしたデータをUTF-8に変換
+                        utf8_data = decoded.encode("utf-8")
+                        logger.debug("デコードしたデータをUTF-8に変換しました")
+                except Exception as e:
+                    logger.error(f"ファイル読み込み中にエラー: {str(e)}")
+                    # 最終手段：バイナリデータをそのまま使用し、Polarsのutf8-lossyで処理
+                    logger.warning(
+                        "最終手段: バイナリデータをそのまま使用し、utf8-lossyで処理"
+                    )
+                    try:
+                        # 一度latin-1でデコードしてからUTF-8にエンコードし直す
+                        # （latin-1は任意のバイト列を文字にマッピングできる）
+                        with self._open_source(file_path, data) as src_file:
+                            content = src_file.read()
+                            decoded = content.decode("latin-1")
+
+                        utf8_data = decoded.encode("utf-8")
+                        logger.debug("latin-1経由でUTF-8に変換しました")
+                    except Exception as e2:
+                        logger.error(f"latin-1変換も失敗: {str(e2)}")
+                        # 本当の最終手段：バイナリデータをそのまま使用する
+                        with self._open_source(file_path, data) as src_file:
+                            utf8_data = src_file.read()
+
+                    # 以降の処理ではutf8-lossyを使用
+                    encoding = "utf8-lossy"
+
+            # 以降の処理ではUTF-8として扱う（バイナリをそのまま使用する場合はutf8-lossy）
+            if encoding != "utf8-lossy":
                 encoding = "utf-8"
-                logger.debug(f"処理対象を一時ファイルに変更: {file_path}")
 
             # キャンセルされたかチェック
             if check_cancelled():
                 logger.warning(f"キャンセル要求を検出: {file_path}")
                 return None
 
-            # Polarsのscan_csvは'utf8'または'utf8-lossy'のみをサポート
+            # Polarsのread_csvは'utf8'または'utf8-lossy'のみをサポート
             polars_encoding = (
                 "utf8" if encoding.lower() in ["utf-8", "utf8"] else "utf8-lossy"
             )
             logger.debug(f"Polars用エンコーディング: {polars_encoding}")
 
-            # LazyFrameとDataFrameの変数
-            lazy_df = None
+            # ヘッダーのDataFrameとデータのLazyFrameの変数
             header_df = None
-            data_df = None
+            data_lf = None
 
             try:
-                # CSVファイルをスキャン
-                logger.debug(f"CSVファイルをスキャン開始: {file_path}")
-                lazy_df = pl.scan_csv(
-                    file_path,
+                # ヘッダー部分（最初の3行）を取得
+                # 全列を文字列として読み込み、スキーマ推論は行わない
+                logger.debug(f"ヘッダー部分（最初の3行）を取得: {file_path}")
+                header_df = pl.read_csv(
+                    io.BytesIO(utf8_data),
                     has_header=False,
+                    n_rows=3,
                     truncate_ragged_lines=True,
                     encoding=polars_encoding,
-                    infer_schema_length=10000,  # スキーマ推論の範囲を増やす
+                    infer_schema_length=0,
                 )
 
                 # キャンセルされたかチェック
@@ -328,48 +347,14 @@ class CsvProcessor:
                     logger.warning(f"キャンセル要求を検出: {file_path}")
                     return None
 
-                # ヘッダー部分（最初の3行）を取得
-                logger.debug("ヘッダー部分（最初の3行）を取得")
-                header_df = lazy_df.slice(0, 3).collect()
-
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
-
-                # データ部分（4行目以降）を取得し、最後の列（空白列）を除外
-                logger.debug("データ部分（4行目以降）を取得")
-                data_df = lazy_df.slice(3, None).collect()[:, :-1]
-
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
-
-                # 列名を設定する（変換前）
-                column_names = ["Time"] + [f"col_{i}" for i in range(1, data_df.width)]
-                data_df.columns = column_names
-                logger.debug(f"列名を設定: {column_names}")
-
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
-
-                # 縦持ちデータにしたい
-                # １列目を日時として、残りの列を値として読み込む
-                logger.debug("データを縦持ち形式に変換")
-                data_df = data_df.unpivot(
-                    index=["Time"],
-                    on=[f"col_{i}" for i in range(1, data_df.width)],
-                    variable_name="sensor_column",
-                    value_name="value",
-                )
-
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
+                # ヘッダーの列数からデータ部分のスキーマを構築する
+                # データ行末尾のカンマによる空白列はスキーマ外として切り捨てられる
+                n_sensors = header_df.width - 1
+                schema = {
+                    "Time": pl.Utf8,
+                    **{f"col_{i}": pl.Utf8 for i in range(1, n_sensors + 1)},
+                }
+                logger.debug(f"データ部分のスキーマを設定: {list(schema.keys())}")
 
                 # センサー情報のマッピングを作成
                 logger.debug("センサー情報のマッピングを作成")
@@ -377,69 +362,114 @@ class CsvProcessor:
                 sensor_names = list(header_df.row(1)[1:])
                 sensor_units = list(header_df.row(2)[1:])
 
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
-
-                # センサー情報のDataFrameを作成（ベクトル化処理のため）
-                logger.debug("センサー情報のDataFrameを作成")
-                sensor_df = pl.DataFrame(
-                    {
-                        "sensor_column": [
-                            f"col_{i + 1}" for i in range(len(sensor_ids))
-                        ],
-                        "sensor_id": sensor_ids,
-                        "sensor_name": sensor_names,
-                        "unit": sensor_units,
-                    }
+                # 無効なセンサー列（センサー名・単位がともに"-"）をヘッダーから特定
+                # 縦持ち変換前に除外し、無効列の行を生成しないようにする
+                valid_indices = [
+                    i
+                    for i, (name, unit) in enumerate(
+                        zip(sensor_names, sensor_units), start=1
+                    )
+                    if not ((name or "").strip() == "-" and (unit or "").strip() == "-")
+                ]
+                logger.debug(
+                    f"無効なセンサー列を除外: {n_sensors - len(valid_indices)}列"
                 )
 
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
+                # 有効なセンサー列がない場合は空の縦持ちデータを返す
+                if not valid_indices:
+                    logger.warning(f"有効なセンサー列がありません: {file_path}")
+                    return pl.DataFrame(
+                        schema={
+                            "Time": pl.Datetime("us"),
+                            "value": pl.Float64,
+                            "value_text": pl.Utf8,
+                            "sensor_id": pl.Categorical,
+                            "sensor_name": pl.Categorical,
+                            "unit": pl.Categorical,
+                        }
+                    )
 
-                # 結合操作でセンサー情報を追加（ベクトル化された処理）
-                logger.debug("センサー情報をデータに結合")
-                data_df = data_df.join(sensor_df, on="sensor_column", how="left")
+                # カテゴリ型をストリーミング実行の各チャンク間で共有するため、文字列キャッシュを有効にする
+                with pl.StringCache():
+                    # データ部分（4行目以降）をスキャン
+                    # 以降の変換はLazyFrameで組み立て、最後にストリーミングで一括実行する
+                    logger.debug("データ部分（4行目以降）をスキャン")
+                    data_lf = pl.scan_csv(
+                        io.BytesIO(utf8_data),
+                        has_header=False,
+                        skip_rows=3,
+                        schema=schema,
+                        truncate_ragged_lines=True,
+                        encoding=polars_encoding,
+                    )
 
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
+                    # Time列の末尾の空白を除去し、datetime型に変換する
+                    # 縦持ち変換前に行うことで、変換はデータ行数分だけで済む
+                    # 単位はDuckDBのTIMESTAMPと同じマイクロ秒に固定し、挿入時の変換を不要にする
+                    data_lf = data_lf.with_columns(
+                        pl.col("Time")
+                        .str.strip_chars()
+                        .str.strptime(pl.Datetime("us"), format="%Y/%m/%d %H:%M:%S")
+                    )
+
+                    # 縦持ちデータにしたい
+                    # unpivot・結合は使わず、センサー列ごとに「日時・値・センサー情報」の
+                    # フレームを作って縦に連結する
+                    logger.debug("センサー列ごとのフレームを作成")
+                    parts = [
+                        data_lf.select(
+                            pl.col("Time"),
+                            pl.col(f"col_{i}").alias("value"),
+                            pl.lit(sensor_ids[i - 1], dtype=pl.Utf8).alias("sensor_id"),
+                            pl.lit(sensor_names[i - 1], dtype=pl.Utf8).alias(
+                                "sensor_name"
+                            ),
+                            pl.lit(sensor_units[i - 1], dtype=pl.Utf8).alias("unit"),
+                        )
+                        for i in valid_indices
+                    ]
+
+                    # キャンセルされたかチェック
+                    if check_cancelled():
+                        logger.warning(f"キャンセル要求を検出: {file_path}")
+                        return None
 
-                # 無効なセンサーデータを除外
-                logger.debug("無効なセンサーデータを除外")
-                data_df = data_df.filter(
-                    ~(
-                        (pl.col("sensor_name").str.strip_chars() == "-")
-                        & (pl.col("unit").str.strip_chars() == "-")
+                    # センサー情報はセンサー数分の種類しかないため、カテゴリ型（辞書エンコード）にする
+                    data_lf = pl.concat(parts, how="vertical").with_columns(
+                        pl.col("sensor_id", "sensor_name", "unit").cast(pl.Categorical)
                     )
-                )
 
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
+                    # 重複行を削除（全列が一致する行のみ）
+                    # センサーIDが重複・空欄の列も値やセンサー名が異なれば別の測定値として残す
+                    # カテゴリ型への変換後に行うことで、センサー情報は文字列ではなく辞書の番号で比較される
+                    data_lf = data_lf.unique(
+                        subset=["Time", "value", "sensor_id", "sensor_name", "unit"],
+                        keep="first",
+                    )
 
-                # Time列の末尾の空白を除去し、datetime型に変換する
-                logger.debug("Time列をdatetime型に変換")
-                data_df = data_df.with_columns(
-                    pl.col("Time")
-                    .str.strip_chars()
-                    .str.strptime(pl.Datetime, format="%Y/%m/%d %H:%M:%S")
-                )
+                    # 値は数値（DOUBLE）として保持し、数値に変換できない値だけ文字列で残す
+                    value_num = (
+                        pl.col("value").str.strip_chars().cast(pl.Float64, strict=False)
+                    )
+                    data_lf = data_lf.with_columns(
+                        value_num.alias("value"),
+                        pl.when(
+                            value_num.is_null()
+                            & (pl.col("value").str.strip_chars() != "")
+                        )
+                        .then(pl.col("value"))
+                        .otherwise(None)
+                        .alias("value_text"),
+                    )
 
-                # キャンセルされたかチェック
-                if check_cancelled():
-                    logger.warning(f"キャンセル要求を検出: {file_path}")
-                    return None
+                    # キャンセルされたかチェック
+                    if check_cancelled():
+                        logger.warning(f"キャンセル要求を検出: {file_path}")
+                        return None
 
-                # センサー列を削除し、重複行を削除
-                logger.debug("センサー列を削除し、重複行を削除")
-                data_df = data_df.drop("sensor_column")
-                data_df = data_df.unique()
+                    # ストリーミングエンジンで実行し、メモリ使用量を抑える
+                    logger.debug("データを縦持ち形式に変換（ストリーミング実行）")
+                    data_df = data_lf.collect(engine="streaming")
 
                 # キャンセルされたかチェック
                 if check_cancelled():
@@ -457,10 +487,6 @@ class CsvProcessor:
             logger.error(f"エンコーディング変換処理中にエラー: {str(e)}")
             # エラーが発生した場合でも処理を続行するため、元のファイルと元のエンコーディングを使用
             return None
-        finally:
-            # 一時ファイルは temp_file コンテキストマネージャによって自動的に削除されるため、
-            # ここでの明示的な削除は不要
-            pass
 
     def add_meta_info(
         self,
@@ -485,15 +511,24 @@ class CsvProcessor:
         logger.debug("データフレームにメタ情報を追加")
 
         # ソースファイル情報とメタ情報を列として追加
+        # ファイル内で一定の値のため、カテゴリ型（辞書エンコード）として追加する
         result_df = data_df.with_columns(
             [
-                pl.lit(str(file_info["file_path"])).alias("source_file"),
-                pl.lit(
-                    str(file_info["source_zip"]) if file_info["source_zip"] else ""
-                ).alias("source_zip"),
-                pl.lit(meta_info.get("factory", "")).alias("factory"),
-                pl.lit(meta_info.get("machine_id", "")).alias("machine_id"),
-                pl.lit(meta_info.get("data_label", "")).alias("data_label"),
+                pl.lit(str(file_info["file_path"]))
+                .cast(pl.Categorical)
+                .alias("source_file"),
+                pl.lit(str(file_info["source_zip"]) if file_info["source_zip"] else "")
+                .cast(pl.Categorical)
+                .alias("source_zip"),
+                pl.lit(meta_info.get("factory", ""))
+                .cast(pl.Categorical)
+                .alias("factory"),
+                pl.lit(meta_info.get("machine_id", ""))
+                .cast(pl.Categorical)
+                .alias("machine_id"),
+                pl.lit(meta_info.get("data_label", ""))
+                .cast(pl.Categorical)
+                .alias("data_label"),
             ]
         )
 
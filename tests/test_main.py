@@ -7,7 +7,9 @@
 import os
 import tempfile
 import unittest
+import zipfile
 from pathlib import Path
+from unittest import mock
 
 import duckdb
 import polars as pl
@@ -16,7 +18,7 @@ from src.config.config import config
 from src.db.db_utils import DatabaseManager
 from src.file.file_processor import FileProcessor
 from src.file.file_utils import FileFinder, FileHasher
-from src.file.zip_handler import ZipHandler
+from src.file.zip_handler import MAX_CACHED_ZIP_FILES, ZipHandler
 from src.processor.csv_processor import CsvProcessor
 
 
@@ -99,6 +101,124 @@ class TestCSVProcessing(unittest.TestCase):
         self.assertIn("sensor_name", result_df.columns)
         self.assertIn("unit", result_df.columns)
 
+    def test_process_csv_file_excludes_invalid_sensors(self):
+        """センサー名・単位が"-"の列が除外されることのテスト"""
+        # 無効なセンサー列を含むCSVファイルを作成
+        invalid_csv_path = self.temp_path / "test_invalid.csv"
+        with open(invalid_csv_path, "w", encoding="utf-8") as f:
+            f.write(", 1000, 1001, 1002\n")
+            f.write(", param_A, -, param_C\n")
+            f.write(", kg, -, cm\n")
+            f.write("2024/1/1 00:00:00,1,2,4,\n")
+
+        # 関数を実行
+        csv_processor = CsvProcessor(encoding="utf-8")
+        result_df = csv_processor.process_csv_file(invalid_csv_path)
+
+        # 結果を検証
+        self.assertIsInstance(result_df, pl.DataFrame)
+        self.assertEqual(result_df.height, 2)
+        self.assertNotIn("1001", [s.strip() for s in result_df["sensor_id"].to_list()])
+
+    def test_process_csv_file_keeps_duplicate_and_blank_sensor_ids(self):
+        """センサーIDが重複・空欄の列の値が失われず、完全に一致する行のみ除外されることのテスト"""
+        # setUpのファイルはセンサーID 1000 の列が2つあり、値が異なる
+        csv_processor = CsvProcessor(encoding="utf-8")
+        result_df = csv_processor.process_csv_file(self.test_csv_path)
+        values_1000 = result_df.filter(
+            pl.col("sensor_id").cast(pl.Utf8).str.strip_chars() == "1000"
+        )
+        self.assertEqual(values_1000.height, 4)
+        self.assertEqual(values_1000["value_text"].drop_nulls().to_list(), ["a", "a"])
+
+        # センサーIDが空欄の列は、値が同じでもセンサー名が異なれば別の測定値として残す
+        blank_csv_path = self.temp_path / "test_blank_id.csv"
+        with open(blank_csv_path, "w", encoding="utf-8") as f:
+            f.write(",,,1002\n")
+            f.write(",temp,press,flow\n")
+            f.write(",C,kPa,L\n")
+            f.write("2024/1/1 00:00:00,1,1,3,\n")
+            # 完全に同じ行は重複として除外される
+            f.write("2024/1/1 00:00:00,1,1,3,\n")
+
+        result_df = csv_processor.process_csv_file(blank_csv_path)
+        self.assertEqual(result_df.height, 3)
+        self.assertEqual(
+            sorted(result_df["sensor_name"].cast(pl.Utf8).to_list()),
+            ["flow", "press", "temp"],
+        )
+
+    def test_process_csv_file_value_columns(self):
+        """数値・数値以外・空の値がvalue列とvalue_text列に振り分けられることのテスト"""
+        value_csv_path = self.temp_path / "test_value.csv"
+        with open(value_csv_path, "w", encoding="utf-8") as f:
+            f.write(", 1000, 1001, 1002, 1003\n")
+            f.write(", param_A, param_B, param_C, param_D\n")
+            f.write(", kg, mm, cm, -\n")
+            f.write("2024/1/1 00:00:00,1,2.5,ON,,\n")
+
+        csv_processor = CsvProcessor(encoding="utf-8")
+        result_df = csv_processor.process_csv_file(value_csv_path)
+
+        values = {
+            row["sensor_id"].strip(): (row["value"], row["value_text"])
+            for row in result_df.iter_rows(named=True)
+        }
+        self.assertEqual(values["1000"], (1.0, None))
+        self.assertEqual(values["1001"], (2.5, None))
+        self.assertEqual(values["1002"], (None, "ON"))
+        self.assertEqual(values["1003"], (None, None))
+
+    def test_migrate_varchar_value_column(self):
+        """value列が文字列型の既存データベースが数値型に移行されることのテスト"""
+        old_db_path = self.temp_path / "old.duckdb"
+        conn = duckdb.connect(str(old_db_path))
+        conn.execute(
+            """
+            CREATE TABLE sensor_data (
+                Time TIMESTAMP, value VARCHAR, sensor_id VARCHAR,
+                sensor_name VARCHAR, unit VARCHAR, source_file VARCHAR,
+                source_zip VARCHAR, factory VARCHAR, machine_id VARCHAR,
+                data_label VARCHAR
+            )
+        """
+        )
+        conn.execute(
+            """
+            INSERT INTO sensor_data (Time, value, sensor_id) VALUES
+                ('2024-01-01 00:00:00', '1', '1000'),
+                ('2024-01-01 00:00:00', '2.5', '1001'),
+                ('2024-01-01 00:00:00', 'ON', '1002'),
+                ('2024-01-01 00:00:00', '', '1003')
+        """
+        )
+        conn.close()
+
+        db_manager = DatabaseManager(old_db_path)
+        try:
+            value_type = db_manager.execute(
+                """
+                SELECT data_type FROM duckdb_columns()
+                WHERE table_name = 'sensor_data' AND column_name = 'value'
+            """
+            ).fetchone()[0]
+            self.assertEqual(value_type, "DOUBLE")
+
+            rows = db_manager.execute(
+                "SELECT sensor_id, value, value_text FROM sensor_data ORDER BY sensor_id"
+            ).fetchall()
+            self.assertEqual(
+                rows,
+                [
+                    ("1000", 1.0, None),
+                    ("1001", 2.5, None),
+                    ("1002", None, "ON"),
+                    ("1003", None, None),
+                ],
+            )
+        finally:
+            db_manager.close()
+
     def test_file_processor(self):
         """FileProcessorクラスのテスト"""
         # テスト用のCSVファイルリストを作成
@@ -135,6 +255,179 @@ class TestCSVProcessing(unittest.TestCase):
         stats = file_processor.process_csv_files(csv_files)
         self.assertEqual(stats["already_processed_by_path"], 1)
 
+    def _make_batch_item(self, file_name, file_hash):
+        """write_batchに渡す (ファイル情報, データフレーム) を作成する"""
+        file_info = {
+            "file_path": self.temp_path / file_name,
+            "source_zip": None,
+            "source_zip_str": None,
+            "file_hash": file_hash,
+        }
+        csv_processor = CsvProcessor(encoding="utf-8")
+        data_df = csv_processor.add_meta_info(
+            csv_processor.process_csv_file(self.test_csv_path), file_info
+        )
+        return file_info, data_df
+
+    def test_write_batch_falls_back_per_file(self):
+        """一括書き込みに失敗した場合、ファイルごとに一度だけ書き込まれることのテスト"""
+        file_processor = FileProcessor(self.db_path)
+        good_a = self._make_batch_item("a.csv", "hash_a")
+        good_b = self._make_batch_item("b.csv", "hash_b")
+        # 日時に変換できない値を含むため、挿入時に失敗するファイル
+        bad_info, bad_df = self._make_batch_item("bad.csv", "hash_bad")
+        bad = (bad_info, bad_df.with_columns(pl.lit("not a time").alias("Time")))
+
+        stats = {"newly_processed": 0, "failed": 0}
+        file_processor.write_batch([good_a, bad, good_b], stats)
+
+        self.assertEqual(stats, {"newly_processed": 2, "failed": 1})
+        rows = dict(
+            file_processor.db_manager.execute(
+                "SELECT source_file, COUNT(*) FROM sensor_data GROUP BY source_file"
+            ).fetchall()
+        )
+        self.assertEqual(
+            rows,
+            {
+                str(good_a[0]["file_path"]): good_a[1].height,
+                str(good_b[0]["file_path"]): good_b[1].height,
+            },
+        )
+        statuses = dict(
+            file_processor.db_manager.execute(
+                "SELECT file_path, status FROM processed_files"
+            ).fetchall()
+        )
+        self.assertEqual(
+            statuses, {"a.csv": "COMPLETED", "b.csv": "COMPLETED", "bad.csv": "FAILED"}
+        )
+
+    def test_upsert_file_statuses(self):
+        """処理状態の一括登録で、重複の除去と既存レコードの更新が行われることのテスト"""
+        # 既存レコード（失敗）を登録
+        self.db_manager.mark_file_as_failed("old/a.csv", "hash_old", None)
+
+        # 同じキー（ファイル名, ZIPファイルパス）のレコードは後のものが優先される
+        self.db_manager.insert_sensor_data_batch(
+            [],
+            [
+                ("dir1/a.csv", "hash_1", None),
+                ("dir1/b.csv", "hash_b", "data.zip"),
+                ("dir2/a.csv", "hash_2", None),
+            ],
+        )
+
+        rows = self.db_manager.execute(
+            """
+            SELECT file_path, source_zip, file_hash, status
+            FROM processed_files ORDER BY file_path
+        """
+        ).fetchall()
+        self.assertEqual(
+            rows,
+            [
+                ("a.csv", "", "hash_2", "COMPLETED"),
+                ("b.csv", "data.zip", "hash_b", "COMPLETED"),
+            ],
+        )
+
+    def test_hash_cache_reused_across_runs(self):
+        """変更のないファイルは次回の実行でハッシュを再計算しないことのテスト"""
+        csv_files = [{"path": self.test_csv_path, "source_zip": None}]
+
+        FileProcessor(self.db_path).process_csv_files(csv_files)
+        cached = self.db_manager.execute(
+            "SELECT path, file_hash FROM file_hash_cache"
+        ).fetchall()
+        self.assertEqual(
+            cached,
+            [
+                (
+                    str(self.test_csv_path.resolve()),
+                    FileHasher.get_file_hash(self.test_csv_path),
+                )
+            ],
+        )
+
+        # 変更のないファイルはキャッシュ済みのハッシュを使う
+        with mock.patch.object(
+            FileProcessor, "compute_file_hash", wraps=FileProcessor.compute_file_hash
+        ) as compute_file_hash:
+            stats = FileProcessor(self.db_path).process_csv_files(
+                csv_files, process_all=True
+            )
+        self.assertEqual(stats["newly_processed"], 1)
+        compute_file_hash.assert_not_called()
+
+        # 内容が変わったファイルはハッシュを再計算する
+        with open(self.test_csv_path, "a", encoding="utf-8") as f:
+            f.write('2024/1/1 00:00:02,1,2,"a",4,\n')
+        with mock.patch.object(
+            FileProcessor, "compute_file_hash", wraps=FileProcessor.compute_file_hash
+        ) as compute_file_hash:
+            FileProcessor(self.db_path).process_csv_files(csv_files, process_all=True)
+        compute_file_hash.assert_called_once()
+
+    def test_insert_sensor_data_skips_unconvertible_rows(self):
+        """Arrowに変換できない行だけを除外し、残りの行は挿入されることのテスト"""
+        _, data_df = self._make_batch_item("rows.csv", "hash_rows")
+        data_df = pl.concat([data_df] * 4, how="vertical").with_row_index("row")
+        bad_row = 5
+        data_df = data_df.with_columns(
+            pl.when(pl.col("row") == bad_row)
+            .then(pl.lit("bad"))
+            .otherwise(pl.col("value_text"))
+            .alias("value_text")
+        ).drop("row")
+
+        # "bad"を含む範囲だけ変換に失敗させる
+        to_arrow = pl.DataFrame.to_arrow
+
+        def failing_to_arrow(df, *args, **kwargs):
+            if (df["value_text"] == "bad").any():
+                raise ValueError("変換できない行")
+            return to_arrow(df, *args, **kwargs)
+
+        with mock.patch.object(
+            pl.DataFrame, "to_arrow", autospec=True, side_effect=failing_to_arrow
+        ):
+            rows_inserted = self.db_manager.insert_sensor_data(data_df)
+
+        self.assertEqual(rows_inserted, data_df.height - 1)
+        result = self.db_manager.execute(
+            "SELECT COUNT(*), COUNT(value_text) FROM sensor_data"
+        ).fetchone()
+        self.assertEqual(
+            result,
+            (data_df.height - 1, data_df["value_text"].is_not_null().sum() - 1),
+        )
+
+    def test_zip_handle_in_use_is_not_closed(self):
+        """キャッシュの上限を超えても、使用中のZIPファイルは閉じられないことのテスト"""
+        zip_paths = []
+        for i in range(MAX_CACHED_ZIP_FILES + 1):
+            zip_path = self.temp_path / f"data_{i}.zip"
+            with zipfile.ZipFile(zip_path, "w") as zf:
+                zf.write(self.test_csv_path, f"sub/test_{i}.csv")
+            zip_paths.append(zip_path)
+
+        try:
+            with ZipHandler.open_zip(zip_paths[0]) as zip_ref:
+                # 他のZIPファイルを上限を超えて開く
+                for i, zip_path in enumerate(zip_paths[1:], start=1):
+                    ZipHandler.read_file(zip_path, f"sub/test_{i}.csv")
+                # 使用中のハンドルからは引き続き読み込める
+                self.assertEqual(
+                    zip_ref.read("sub/test_0.csv"), self.test_csv_path.read_bytes()
+                )
+            self.assertEqual(
+                ZipHandler.read_file(zip_paths[0], "sub/test_0.csv"),
+                self.test_csv_path.read_bytes(),
+            )
+        finally:
+            ZipHandler.close_all()
+
 
 if __name__ == "__main__":
     unittest.main()